@@ -11,12 +11,19 @@ Version: 2.1.0
 License: MIT
 """
 
-try:
-    from .core import SoulMemorySystem
-except ImportError:
-    from core import SoulMemorySystem
-
 __version__ = "2.1.0"
 __description__ = "AI Memory Management System"
 
 __all__ = ['SoulMemorySystem']
+
+
+def __getattr__(name):
+    """PEP 562 延遲載入：只有真正用到 SoulMemorySystem 才導入 core"""
+    if name == 'SoulMemorySystem':
+        try:
+            from .core import SoulMemorySystem
+        except ImportError:
+            from core import SoulMemorySystem
+        globals()[name] = SoulMemorySystem
+        return SoulMemorySystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,65 +7,143 @@ Compatible with Soul Memory v3.3.1
 
 import re
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
 # Memory 目錄
 MEMORY_DIR = Path("/root/.openclaw/workspace/memory")
 
+# 待處理文件數達到此值時使用多進程
+PARALLEL_MIN_FILES = 8
+
+# Heartbeat 報告區塊的起始行（多種格式）
+# - "## [N] 14:22-23:46 - Heartbeat 系統運作摘要" 等標題條目，直到下一條 --- 分隔線
+# - "🔥 [..] ... Heartbeat" / "1. 🔥 ... Heartbeat" 區塊，直到 *Source: ...* 行
+# 只對單行做匹配，避免整份文件 DOTALL 懶惰匹配的回溯
+_SECTION_HEADER_RE = re.compile(r'##\s+\[[^\]]*\]\s+.*Heartbeat')
+_FIRE_HEADER_RE = re.compile(r'(?:\d+\.\s+🔥|🔥\s+\[[^\]]*\]).*Heartbeat')
+_BLANKS_RE = re.compile(r'\n{3,}')
+_SEPARATOR_RE = re.compile(r'-{3,}')
+
+
+def _is_separator(line):
+    # 整行只有三個或以上的 - 才算分隔線（含 heartbeat-trigger 寫入的 50 個 - 分隔線；以 --- 結尾的正文不算）
+    return _SEPARATOR_RE.fullmatch(line.strip()) is not None
+
+
+def _ends_section_header(tail):
+    # 單行條目："## [N] ... Heartbeat ... ---" 在標題行自身結束
+    return tail.rstrip().endswith('---')
+
+
+def _is_source_line(line):
+    idx = line.find('*Source:')
+    return idx != -1 and line.rstrip().endswith('*') and len(line.rstrip()) > idx + 1
+
+
+def strip_heartbeat_blocks(content):
+    """
+    線性掃描移除 Heartbeat 報告區塊
+
+    Returns:
+        (str, int): (清理後內容, 移除區塊數)
+    """
+    kept = []
+    pending = []      # 當前候選區塊（未遇到結束行前暫存）
+    is_done = None    # 當前區塊的結束判斷函數
+    removed = 0
+
+    for line in content.splitlines(keepends=True):
+        if is_done is None:
+            match = _SECTION_HEADER_RE.search(line)
+            if match:
+                is_done, ends_here = _is_separator, _ends_section_header
+            else:
+                match = _FIRE_HEADER_RE.search(line)
+                if not match:
+                    kept.append(line)
+                    continue
+                is_done = ends_here = _is_source_line
+            
+            # 結束條件先對標題行本身（Heartbeat 之後的部分）檢查：單行區塊只移除這一行
+            if ends_here(line[match.end():]):
+                removed += 1
+                is_done = None
+                continue
+            pending = [line]
+            continue
+
+        pending.append(line)
+        if is_done(line):
+            removed += 1
+            pending = []
+            is_done = None
+
+    # 找不到結束行的區塊保持原樣
+    kept.extend(pending)
+    return ''.join(kept), removed
+
+def _clean_one(path):
+    """
+    清理單個文件（可在子進程中執行）
+
+    Returns:
+        (str, int, bool, str): (路徑, 移除數, 是否修改, 錯誤訊息)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        # 快速預過濾：沒有 Heartbeat 字樣的文件不進入掃描
+        if 'Heartbeat' not in content:
+            return path, 0, False, ''
+        
+        # 移除 Heartbeat 區塊
+        cleaned, cleaned_count = strip_heartbeat_blocks(content)
+        
+        # 清理多餘的空行
+        cleaned = _BLANKS_RE.sub('\n\n', cleaned)
+        
+        # 如果內容有變化，寫回文件
+        if cleaned == content:
+            return path, 0, False, ''
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(cleaned)
+        return path, cleaned_count, True, ''
+    except Exception as e:
+        return path, 0, False, str(e)
+
 def clean_heartbeat_reports():
     """清理所有記憶文件中的 Heartbeat 報告"""
     if not MEMORY_DIR.exists():
         print(f"❌ Memory 目錄不存在: {MEMORY_DIR}")
         return
     
-    # 獲取所有 .md 文件
-    md_files = sorted(MEMORY_DIR.glob("*.md"))
+    # 獲取所有 .md 文件（os.scandir 一次列目錄，保持字串路徑）
+    with os.scandir(MEMORY_DIR) as it:
+        pending = sorted(e.path for e in it if e.name.endswith('.md') and e.is_file())
     total_cleaned = 0
     files_modified = 0
     
-    # Heartbeat 報告的正則表達式模式（多種格式）
-    patterns = [
-        # 匹配 "## [N] 14:22-23:46 - Heartbeat 系統運作摘要" 格式
-        r'##\s+\[N\]\s+.*?Heartbeat\s+.*?\n###.*?\n.*?---\s*\n',
-        # 匹配包含 Heartbeat 的條目
-        r'##\s+\[.*?\]\s+.*?Heartbeat.*?\n.*?---\s*\n',
-        # 匹配完整 Heartbeat 區塊
-        r'🔥\s+\[.*?\].*?Heartbeat.*?\*Source:.*?\*\s*\n',
-        # 匹配 "🩺 Heartbeat 報告" 區塊
-        r'\d+\.\s+🔥.*?Heartbeat.*?\*Source:.*?\*\s*\n'
-    ]
+    # 各文件互不依賴，文件較多時分派到多進程
+    if len(pending) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(_clean_one, pending, chunksize=8))
+    else:
+        results = [_clean_one(path) for path in pending]
     
-    for md_file in md_files:
-        try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            original_content = content
-            cleaned_count = 0
-            
-            # 應用所有清理模式
-            for pattern in patterns:
-                matches = re.findall(pattern, content, re.DOTALL | re.MULTILINE)
-                cleaned_count += len(matches)
-                content = re.sub(pattern, '', content, flags=re.DOTALL | re.MULTILINE)
-            
-            # 清理多餘的空行
-            content = re.sub(r'\n{3,}', '\n\n', content)
-            
-            # 如果內容有變化，寫回文件
-            if content != original_content:
-                with open(md_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                files_modified += 1
-                total_cleaned += cleaned_count
-                print(f"✅ 清理: {md_file.name} ({cleaned_count} 條 Heartbeat)")
-                
-        except Exception as e:
-            print(f"❌ 錯誤處理 {md_file}: {e}")
+    for path, cleaned_count, modified, error in results:
+        if error:
+            print(f"❌ 錯誤處理 {path}: {error}")
+        elif modified:
+            files_modified += 1
+            total_cleaned += cleaned_count
+            print(f"✅ 清理: {os.path.basename(path)} ({cleaned_count} 條 Heartbeat)")
     
     print(f"\n📊 清理總結 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}):")
-    print(f"   處理文件: {len(md_files)}")
+    print(f"   處理文件: {len(pending)}")
     print(f"   修改文件: {files_modified}")
     print(f"   移除 Heartbeat: {total_cleaned} 條")
     print(f"🏛️ Heartbeat 清理完成！")
@@ -13,7 +13,7 @@ sys.path.append(str(PROJECT_ROOT))
 
 from modules.priority_parser import PriorityParser
 from modules.vector_search import VectorSearch
-from modules.dynamic_classifier import DynamicClassifier
+from modules.dynamic_classifier import get_classifier
 from modules.semantic_dedup import PersistentDedup
 from modules.version_control import VersionControl
 
@@ -32,7 +32,7 @@ class SoulMemorySystem:
         
         self.priority_parser = PriorityParser()
         self.vector_search = VectorSearch()
-        self.dynamic_classifier = DynamicClassifier()
+        self.dynamic_classifier = get_classifier()
         # v3.5.4: 提高 threshold 到 0.92（減少誤去重）
         self.dedup = PersistentDedup(str(self.workspace / "data" / "dedup.json"), threshold=0.92, category_based=True)
         self.version_control = VersionControl(str(self.workspace))
@@ -43,6 +43,9 @@ class SoulMemorySystem:
         """Initialize the memory system and build the search index"""
         print(f"🧠 Initializing Soul Memory System v{self.VERSION}...")
         
+        # Full rebuild: start from an empty index so re-initializing never duplicates segments
+        self.vector_search.load_index({})
+
         if self.memory_file.exists():
             self.vector_search.index_file(self.memory_file)
             
@@ -57,6 +60,11 @@ class SoulMemorySystem:
         self.indexed = True
         print("✅ Memory system initialized")
 
+    @staticmethod
+    def _memory_id(text: str) -> str:
+        """Stable 64-bit content id (blake2b, hex-encoded)."""
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
     def _extract_memory_payload(self, text: str) -> str:
         """Extract a compact, reusable memory snippet from verbose context."""
         if not text:
@@ -175,55 +183,82 @@ class SoulMemorySystem:
         if not self.indexed:
             self.initialize()
 
+        # 重複查詢由 VectorSearch 的結果快取處理（索引變更時自動失效）
         resolved_top_k, resolved_min_score = self._resolve_search_parameters(query, top_k, min_score)
-        results = self.vector_search.search(query, top_k=resolved_top_k, min_score=resolved_min_score)
-        return results
+        return self.vector_search.search(query, top_k=resolved_top_k, min_score=resolved_min_score)
 
     def add_memory(self, content: str, priority: Optional[str] = None) -> str:
         """Add a new memory with automatic classification and priority detection"""
-        parsed = self.priority_parser.parse(content)
-        if not priority:
-            priority = parsed.priority.value
+        return self.add_memories([content], priority)[0]
+
+    def add_memories(self, contents: List[str], priority: Optional[str] = None) -> List[str]:
+        """Add several memories with one daily-file append, one dedup flush and one commit"""
+        memory_ids = []
+        records = []
+        for content in contents:
+            parsed = self.priority_parser.parse(content)
+            item_priority = priority or parsed.priority.value
+
+            candidate = self._extract_memory_payload(parsed.content)
+            if not candidate:
+                candidate = self._extract_memory_payload(content)
+            memory_ids.append(self._memory_id(candidate))
+
+            category = self.dynamic_classifier.classify(candidate)
+            should_persist, _reason = self._should_persist_memory(candidate, item_priority, category)
+            if not should_persist:
+                continue
 
-        candidate = self._extract_memory_payload(parsed.content)
-        if not candidate:
-            candidate = self._extract_memory_payload(content)
+            is_duplicate, _dup_type = self.dedup.is_duplicate(candidate, category)
+            if is_duplicate:
+                continue
 
-        category = self.dynamic_classifier.classify(candidate)
-        should_persist, _reason = self._should_persist_memory(candidate, priority, category)
-        if not should_persist:
-            return hashlib.md5(candidate.encode()).hexdigest()
+            # 先記入記憶體，讓同一批次內的重複項也能被去重；持久化留到批次結束
+            self.dedup.save(candidate, category, persist=False)
+            records.append((candidate, item_priority, category))
 
-        is_duplicate, _dup_type = self.dedup.is_duplicate(candidate, category)
-        if is_duplicate:
-            return hashlib.md5(candidate.encode()).hexdigest()
+        if not records:
+            return memory_ids
 
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        memory_entry = f"\n\n---\n\n## {category} [{priority}] ({timestamp})\n\n{candidate}\n"
-
         # Append to daily file
         today_str = datetime.now().strftime('%Y-%m-%d')
         daily_file = self.daily_dir / f"{today_str}.md"
 
         with open(daily_file, "a", encoding="utf-8") as f:
-            f.write(memory_entry)
-
-        # Update index
-        self.vector_search.add_segment({
-            'content': candidate,
-            'priority': priority,
-            'category': category,
-            'timestamp': timestamp,
-            'source': str(daily_file)
-        })
-
-        self.dedup.save(candidate, category)
-
-        # Version control
-        self.version_control.commit(f"Add memory: {category} [{priority}]")
+            f.write(''.join(
+                f"\n\n---\n\n## {category} [{item_priority}] ({timestamp})\n\n{candidate}\n"
+                for candidate, item_priority, category in records
+            ))
+
+        # Update index incrementally; before initialize() the daily file is indexed from disk
+        if self.indexed:
+            self.vector_search.add_segments([
+                {
+                    'content': candidate,
+                    'priority': item_priority,
+                    'category': category,
+                    'timestamp': timestamp,
+                    'source': str(daily_file)
+                }
+                for candidate, item_priority, category in records
+            ])
+
+        self.dedup.flush()
+
+        # Version control: stage only the files this write touched; committed by the background worker
+        if len(records) == 1:
+            _candidate, item_priority, category = records[0]
+            message = f"Add memory: {category} [{item_priority}]"
+        else:
+            message = f"Add {len(records)} memories"
+        self.version_control.commit_async(
+            message,
+            files=[str(daily_file), str(self.dedup.storage_path)]
+        )
 
-        return hashlib.md5(candidate.encode()).hexdigest()
+        return memory_ids
 
     def post_response_trigger(self, query: str, response: str, importance_threshold: str = "I") -> Optional[str]:
         """Automatically identify and save important content after a response"""
@@ -73,6 +73,7 @@ class SoulMemorySystem:
     """
 
     VERSION = "3.4.0"
+    INDEX_FORMAT = 2
 
     def __init__(self, base_path: Optional[str] = None):
         """Initialize memory system"""
@@ -104,38 +105,37 @@ class SoulMemorySystem:
         print(f"🧠 Initializing Soul Memory System v{self.VERSION}...")
 
         # Load or build search index
+        # v3.4.0: 單一 JSON 快取（帶倒排表與 format 標記），舊版 index.json 讀取後原地升級
+        # 快取只存純數據，不用 pickle：被改寫的快取文件不能執行任何代碼
         index_file = self.cache_path / "index.json"
 
+        index_data = self._read_index_cache(index_file)
+
         # v3.3.3: 每日快取自動重建 - 檢查快取日期
-        cache_outdated = False
-        if index_file.exists():
-            try:
-                with open(index_file, 'r', encoding='utf-8') as f:
-                    index_data = json.load(f)
-                if 'built_at' in index_data:
-                    built_date = index_data['built_at'].split('T')[0]
-                    today = datetime.now().strftime('%Y-%m-%d')
-                    if built_date != today:
-                        cache_outdated = True
-                        print(f"📅 Cache from {built_date}, rebuilding for {today}...")
-            except:
+        cache_outdated = index_data is None
+        if index_data is not None and 'built_at' in index_data:
+            built_date = index_data['built_at'].split('T')[0]
+            today = datetime.now().strftime('%Y-%m-%d')
+            if built_date != today:
                 cache_outdated = True
+                print(f"📅 Cache from {built_date}, rebuilding for {today}...")
 
-        if index_file.exists() and not cache_outdated:
+        if not cache_outdated:
             try:
-                with open(index_file, 'r', encoding='utf-8') as f:
-                    index_data = json.load(f)
                 self.vector_search.load_index(index_data)
                 self.classifier.load_categories(index_data.get('categories', []))
                 self.indexed = True
                 print(f"✅ Loaded index with {len(index_data.get('segments', []))} segments")
+                if index_data.get('format') != self.INDEX_FORMAT:
+                    self._save_index(index_file, built_at=index_data.get('built_at'))
             except Exception as e:
                 print(f"⚠️  Failed to load index: {e}")
                 cache_outdated = True
 
-        if cache_outdated or not index_file.exists():
+        if cache_outdated:
             print("🔨 Building search index...")
             self._build_index()
+            self._save_index(index_file)
             print("✅ Index built successfully")
 
         # v3.4.0: 初始化語義緩存
@@ -147,6 +147,35 @@ class SoulMemorySystem:
 
         print("✅ Memory system initialized\n")
 
+    def _read_index_cache(self, index_file: Path) -> Optional[Dict[str, Any]]:
+        """Read the index cache once; legacy caches (no format key) are returned for migration"""
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        # 無 format 的舊版快取仍可加載；其他版本號的布局未知，需要重建
+        if data.get('format', self.INDEX_FORMAT) == self.INDEX_FORMAT:
+            return data
+        return None
+
+    def _save_index(self, index_file: Path, built_at: Optional[str] = None):
+        """Persist the search index as compact JSON (plain data only, safe to load)"""
+        data = self.vector_search.export_index()
+        data['format'] = self.INDEX_FORMAT
+        data['built_at'] = built_at or datetime.now().isoformat()
+        data['categories'] = {
+            name: list(cat.keywords)
+            for name, cat in self.classifier.categories.items()
+        }
+        try:
+            tmp_file = index_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_file, index_file)
+        except Exception as e:
+            print(f"⚠️  Failed to save index: {e}")
+
     def _build_index(self):
         """Build search index from memory files"""
         # Implementation remains the same as v3.3.4
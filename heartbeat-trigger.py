@@ -7,8 +7,10 @@ v3.5.10 - 檢查上次 heartbeat 到現在的消息，避免遺漏
 import sys
 import os
 import json
+import mmap
 import re
 import hashlib
+from collections import Counter
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
@@ -35,6 +37,9 @@ DEDUP_FILE = Path.home() / ".openclaw" / "workspace" / "soul-memory" / "dedup_ha
 # Heartbeat 狀態文件（記錄上次執行時間）
 HEARTBEAT_STATE_FILE = Path.home() / ".openclaw" / "workspace" / "soul-memory" / "heartbeat_state.json"
 
+# Active session 快取（以 sessions.json 的 mtime 為鍵）
+ACTIVE_SESSION_CACHE_FILE = Path.home() / ".openclaw" / "workspace" / "soul-memory" / "active_session_cache.json"
+
 def get_heartbeat_state():
     """讀取上次 heartbeat 執行時間"""
     if not HEARTBEAT_STATE_FILE.exists():
@@ -57,9 +62,36 @@ def save_heartbeat_state():
     except Exception as e:
         print(f"⚠️ 無法保存 heartbeat 狀態：{e}")
 
+def _read_active_session_cache(cache_key):
+    """讀取 active session 快取（sessions.json 未變更時有效）"""
+    try:
+        with open(ACTIVE_SESSION_CACHE_FILE, 'r') as f:
+            data = json.load(f)
+        if data.get('key') == cache_key:
+            return data.get('session_id')
+    except Exception:
+        pass
+    return None
+
+def _write_active_session_cache(cache_key, session_id):
+    """保存 active session 快取"""
+    try:
+        ACTIVE_SESSION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(ACTIVE_SESSION_CACHE_FILE, 'w') as f:
+            json.dump({'key': cache_key, 'session_id': session_id}, f)
+    except Exception as e:
+        print(f"⚠️ 無法保存 session 快取：{e}")
+
 def get_active_session_id():
     """獲取當前 active session 的 ID（排除 cron/HEARTBEAT session）v3.5.8"""
     try:
+        # sessions.json 未變更（mtime + 大小相同）時直接使用上次結果
+        st = os.stat(SESSIONS_JSON)
+        cache_key = [st.st_mtime_ns, st.st_size]
+        cached_session = _read_active_session_cache(cache_key)
+        if cached_session:
+            return cached_session
+
         with open(SESSIONS_JSON, 'r', encoding='utf-8') as f:
             sessions = json.load(f)
         
@@ -77,11 +109,51 @@ def get_active_session_id():
                     best_time = data['updatedAt']
                     best_session = session_id
         
+        if best_session:
+            _write_active_session_cache(cache_key, best_session)
         return best_session
     except Exception as e:
         print(f"⚠️ 無法讀取 sessions.json: {e}")
         return None
 
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"]+)"')
+
+# Python 3.11+ 的 fromisoformat 已支援 'Z' 後綴，免去每行一次 replace
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
+
+def _parse_timestamp(timestamp_str):
+    """解析 ISO 時間戳並轉為 naive datetime"""
+    if not _FROMISO_HANDLES_Z and timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp_str).replace(tzinfo=None)
+
+
+def _find_tail_offset(f, cutoff_time):
+    """從檔尾逐行往回掃描，返回第一條不早於 cutoff_time 的行的位元組偏移
+
+    只用正則提取 timestamp 欄位，不做完整 JSON 解析；
+    精確的時間過濾仍由正向解析完成。
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # 空檔案
+        return 0
+
+    with mm:
+        end = len(mm)
+        while end > 0:
+            start = mm.rfind(b'\n', 0, end - 1) + 1
+            match = _TIMESTAMP_RE.search(mm, start, end)
+            if match:
+                try:
+                    if _parse_timestamp(match.group(1).decode()) < cutoff_time:
+                        return end
+                except ValueError:
+                    pass
+            end = start
+    return 0
+
 def read_session_messages(session_id, last_check_time=None, hours=3):
     """讀取 session 對話內容（上次 heartbeat 到現在；若無狀態則 fallback 最近 N 小時）"""
     session_file = SESSIONS_DIR / f"{session_id}.jsonl"
@@ -103,7 +175,9 @@ def read_session_messages(session_id, last_check_time=None, hours=3):
         print(f"📅 無 heartbeat_state，fallback 檢查最近 {hours} 小時")
     
     try:
-        with open(session_file, 'r', encoding='utf-8') as f:
+        with open(session_file, 'rb') as f:
+            # 跳過 cutoff 之前的舊消息，只解析檔尾
+            f.seek(_find_tail_offset(f, cutoff_time))
             for line in f:
                 if not line.strip():
                     continue
@@ -121,8 +195,7 @@ def read_session_messages(session_id, last_check_time=None, hours=3):
                         continue
                     
                     try:
-                        msg_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                        msg_time = msg_time.replace(tzinfo=None)
+                        msg_time = _parse_timestamp(timestamp_str)
                     except:
                         continue
                     
@@ -157,6 +230,40 @@ def read_session_messages(session_id, last_check_time=None, hours=3):
     
     return messages
 
+# 強制記錄關鍵詞（必須記錄 [C] Critical）
+FORCE_RECORD_KEYWORDS = [
+    # 安裝/部署
+    '安裝', 'install', 'npm install', 'pip install', 'apt install', 'yarn add',
+    '部署', 'deploy', 'setup', '配置', 'config', 'configure',
+    # 參數修改
+    '參數', 'parameter', '修改', 'change', 'update', '設定', 'setting',
+    'API Key', 'Token', '密鑰', 'key', 'secret', 'password',
+    'provider', '模型', 'model', 'baseUrl', 'endpoint',
+    # 開發程式
+    '開發', 'develop', '編程', 'programming', '代碼', 'code',
+    '創建', 'create', '新增', 'add', '刪除', 'delete', 'remove',
+    '修改', 'modify', 'edit', '更新', 'update',
+    '測試', 'test', 'debug', '調試', '運行', 'run',
+    'git', 'commit', 'push', 'pull', 'clone', 'branch',
+    '文件', 'file', '目錄', 'directory', '路徑', 'path',
+    'skill', '技能', 'clawhub', 'plugin',
+    # 系統操作
+    '重啟', 'restart', '啟動', 'start', '停止', 'stop',
+    '服務', 'service', '進程', 'process', '端口', 'port',
+    # OpenClaw 特定
+    'openclaw', 'gateway', 'agent', 'session',
+]
+
+# 用戶指令關鍵詞（用戶主動要求 = 重要）
+USER_INTENT_KEYWORDS = [
+    '記住', '保存', '備忘', '提醒', '重要',
+    '做', '執行', '完成', '檢查', '查看',
+]
+
+# 預編譯為單一交替正則：每條消息只需一次掃描（關鍵詞已小寫，匹配小寫內容）
+_FORCE_RECORD_RE = re.compile('|'.join(re.escape(kw.lower()) for kw in FORCE_RECORD_KEYWORDS))
+_USER_INTENT_RE = re.compile('|'.join(re.escape(kw) for kw in USER_INTENT_KEYWORDS))
+
 def identify_important_content(messages):
     """識別重要內容（超寬鬆模式 v3.4.0 - 強制記錄技術操作）v3.5.12"""
     important = []
@@ -164,36 +271,6 @@ def identify_important_content(messages):
     # v3.5.12: 只處理用戶消息，不保存助手回應
     messages = [msg for msg in messages if msg.get('role') == 'user']
     
-    # 強制記錄關鍵詞（必須記錄 [C] Critical）
-    force_record_keywords = [
-        # 安裝/部署
-        '安裝', 'install', 'npm install', 'pip install', 'apt install', 'yarn add',
-        '部署', 'deploy', 'setup', '配置', 'config', 'configure',
-        # 參數修改
-        '參數', 'parameter', '修改', 'change', 'update', '設定', 'setting',
-        'API Key', 'Token', '密鑰', 'key', 'secret', 'password',
-        'provider', '模型', 'model', 'baseUrl', 'endpoint',
-        # 開發程式
-        '開發', 'develop', '編程', 'programming', '代碼', 'code',
-        '創建', 'create', '新增', 'add', '刪除', 'delete', 'remove',
-        '修改', 'modify', 'edit', '更新', 'update',
-        '測試', 'test', 'debug', '調試', '運行', 'run',
-        'git', 'commit', 'push', 'pull', 'clone', 'branch',
-        '文件', 'file', '目錄', 'directory', '路徑', 'path',
-        'skill', '技能', 'clawhub', 'plugin',
-        # 系統操作
-        '重啟', 'restart', '啟動', 'start', '停止', 'stop',
-        '服務', 'service', '進程', 'process', '端口', 'port',
-        # OpenClaw 特定
-        'openclaw', 'gateway', 'agent', 'session',
-    ]
-    
-    # 用戶指令關鍵詞（用戶主動要求 = 重要）
-    user_intent_keywords = [
-        '記住', '保存', '備忘', '提醒', '重要',
-        '做', '執行', '完成', '檢查', '查看',
-    ]
-    
     for msg in messages:
         content = msg['content']
         
@@ -212,12 +289,10 @@ def identify_important_content(messages):
         is_force_record = False
         
         # 檢查強制記錄關鍵詞
-        for keyword in force_record_keywords:
-            if keyword.lower() in content.lower():
-                importance_score += 3
-                priority = 'C'
-                is_force_record = True
-                break
+        if _FORCE_RECORD_RE.search(content.lower()):
+            importance_score += 3
+            priority = 'C'
+            is_force_record = True
         
         # 長文本內容（降低閾值 > 50 字）
         if len(content) > 50:
@@ -226,10 +301,8 @@ def identify_important_content(messages):
             importance_score += 1
         
         # 檢查用戶意圖關鍵詞
-        for keyword in user_intent_keywords:
-            if keyword in content:
-                importance_score += 2
-                break
+        if _USER_INTENT_RE.search(content):
+            importance_score += 2
         
         # 用戶消息（用戶說的話更重要）
         if msg['role'] == 'user':
@@ -299,18 +372,25 @@ def get_daily_output_file(base_date=None, max_lines=500, max_bytes=50*1024):
             return candidate
 
         try:
+            # 先看檔案大小（stat 不讀內容），超限的檔案無需讀入再數行
+            size = candidate.stat().st_size
+            if size > max_bytes:
+                continue
             txt = candidate.read_text(encoding='utf-8')
             line_count = txt.count('\n') + 1
-            size = candidate.stat().st_size
-            if line_count <= max_lines and size <= max_bytes:
+            if line_count <= max_lines:
                 return candidate
         except Exception:
             return candidate
 
     return daily_dir / f"{base_date}-overflow.md"
 
-def save_to_daily_file(content, priority):
-    """保存到 daily file（使用香港時間）"""
+def save_to_daily_file(items):
+    """批量保存到 daily file（使用香港時間）
+
+    Args:
+        items: [{'content': str, 'priority': str}, ...]，整批只開檔寫入一次
+    """
     hk_now = get_hk_datetime()
     today = hk_now.strftime('%Y-%m-%d')
     daily_dir = Path.home() / ".openclaw" / "workspace" / "memory"
@@ -321,16 +401,19 @@ def save_to_daily_file(content, priority):
     
     # 生成內容
     timestamp = hk_now.strftime('%H:%M')
-    header = "\n\n" + "-" * 50 + "\n"
-    header += f"## [{priority}] {timestamp} - Heartbeat 自動提取\n"
-    header += f"**來源**：Session 對話回顧\n"
-    header += f"**時區**：HKT (UTC+8)\n\n"
+    parts = []
+    for item in items:
+        header = "\n\n" + "-" * 50 + "\n"
+        header += f"## [{item['priority']}] {timestamp} - Heartbeat 自動提取\n"
+        header += f"**來源**：Session 對話回顧\n"
+        header += f"**時區**：HKT (UTC+8)\n\n"
+        parts.append(header)
+        parts.append(item['content'])
+        parts.append('\n')
     
-    # 追加到檔案
-    with open(daily_file, 'a', encoding='utf-8') as f:
-        f.write(header)
-        f.write(content)
-        f.write('\n')
+    # 追加到檔案（單次寫入）
+    with open(daily_file, 'a', encoding='utf-8', buffering=1024 * 1024) as f:
+        f.write(''.join(parts))
     
     return str(daily_file)
 
@@ -359,7 +442,12 @@ def normalize_for_dedup(content):
     return normalized
 
 def get_content_hash(content):
-    """計算內容哈希（用於去重）"""
+    """計算內容哈希（用於去重；blake2b 64-bit，16 位十六進制）"""
+    normalized = normalize_for_dedup(content)
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+def get_legacy_content_hash(content):
+    """舊版 MD5 內容哈希（32 位），僅用於比對升級前當天已記錄的哈希"""
     normalized = normalize_for_dedup(content)
     return hashlib.md5(normalized.encode('utf-8')).hexdigest()
 
@@ -369,20 +457,24 @@ def get_saved_hashes(today_date=None):
         today_date = get_hk_datetime().strftime('%Y-%m-%d')
 
     if not DEDUP_FILE.exists():
-        return {}
+        return set()
 
     try:
         with open(DEDUP_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
 
-        # 返回今天的哈希集合
-        return data.get(today_date, set())
+        # 返回今天的哈希集合（set 查詢 O(1)，磁碟上仍存為列表）
+        return set(data.get(today_date, ()))
     except Exception as e:
         print(f"⚠️ 讀取去重記錄失敗: {e}")
         return set()
 
 def save_hash(today_date, content_hash):
     """記錄新的內容哈希"""
+    save_hashes(today_date, [content_hash])
+
+def save_hashes(today_date, content_hashes):
+    """批量記錄內容哈希（讀寫去重檔各一次）"""
     try:
         # 讀取現有記錄
         if DEDUP_FILE.exists():
@@ -391,20 +483,24 @@ def save_hash(today_date, content_hash):
         else:
             data = {}
 
-        # 更新今天的哈希集合
-        if today_date not in data:
-            data[today_date] = []
-
-        if content_hash not in data[today_date]:
-            data[today_date].append(content_hash)
+        # 更新今天的哈希集合（保持原有順序）
+        today_hashes = data.setdefault(today_date, [])
+        seen = set(today_hashes)
+        for content_hash in content_hashes:
+            if content_hash not in seen:
+                seen.add(content_hash)
+                today_hashes.append(content_hash)
 
         # 保存
         with open(DEDUP_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
 
     except Exception as e:
         print(f"⚠️ 保存去重記錄失敗: {e}")
 
+# Daily file 標記（互不重疊，一次 findall 等同三次 str.count）
+_DAILY_MARKER_RE = re.compile(r'\[Auto-Save\]|## \[I\]|## \[C\]')
+
 def check_daily_memory():
     """檢查今日記憶檔案（使用香港時間）"""
     today = get_hk_datetime().strftime('%Y-%m-%d')
@@ -414,9 +510,10 @@ def check_daily_memory():
         with open(daily_file, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # 計算各類標記數量
-        auto_save_count = content.count('[Auto-Save]')
-        heartbeat_extract_count = content.count('## [I]') + content.count('## [C]') - content.count('[Auto-Save]')
+        # 計算各類標記數量（單次掃描）
+        counts = Counter(_DAILY_MARKER_RE.findall(content))
+        auto_save_count = counts['[Auto-Save]']
+        heartbeat_extract_count = counts['## [I]'] + counts['## [C]'] - auto_save_count
         
         return auto_save_count, heartbeat_extract_count
     
@@ -460,26 +557,35 @@ def main():
         today = get_hk_datetime().strftime('%Y-%m-%d')
         saved_hashes = get_saved_hashes(today)
         print(f"🔒 已有 {len(saved_hashes)} 條今日記憶")
+        # 升級當天仍可能有舊版 MD5 哈希，只在存在時才額外計算
+        has_legacy_hashes = any(len(h) == 32 for h in saved_hashes)
 
         # 保存重要內容（跳過重複）
         saved_count = 0
         skipped_count = 0
+        pending = []
 
         for item in important:
             content_hash = get_content_hash(item['content'])
 
             # 檢查是否已經保存過
-            if content_hash in saved_hashes:
+            if content_hash in saved_hashes or (
+                has_legacy_hashes and get_legacy_content_hash(item['content']) in saved_hashes
+            ):
                 skipped_count += 1
                 print(f"  ⏭️  跳過重複 [{item['priority']}] - {len(item['content'])} 字")
                 continue
 
-            # 保存新內容
-            daily_file = save_to_daily_file(item['content'], item['priority'])
-            save_hash(today, content_hash)  # 記錄哈希
+            # 收集新內容，稍後一次寫入（同批重複也會被跳過）
+            saved_hashes.add(content_hash)
+            pending.append((item, content_hash))
             saved_count += 1
             print(f"  ✅ 保存 [{item['priority']}] {saved_count}/{len(important)} - {len(item['content'])} 字")
 
+        if pending:
+            daily_file = save_to_daily_file([item for item, _ in pending])
+            save_hashes(today, [content_hash for _, content_hash in pending])  # 記錄哈希
+
         if saved_count > 0:
             print(f"💾 已保存 {saved_count} 條新記憶至 {daily_file}")
         if skipped_count > 0:
@@ -11,9 +11,13 @@ Soul Memory Heartbeat Auto-Save Trigger v3.3
 
 import sys
 import os
+import io
 import json
+import hashlib
+import mmap
 import re
 from pathlib import Path
+from collections import Counter
 from datetime import datetime, timedelta
 
 SOUL_MEMORY_PATH = os.environ.get('SOUL_MEMORY_PATH', os.path.dirname(__file__))
@@ -37,6 +41,10 @@ SESSIONS_JSON = SESSIONS_DIR / "sessions.json"
 DATA_DIR = Path.home() / ".openclaw" / "workspace" / "soul-memory" / "data"
 DEDUP_FILE = DATA_DIR / "dedup.json"
 TAG_INDEX_FILE = DATA_DIR / "tag_index.json"
+DAY_STATS_FILE = DATA_DIR / "daily_stats.json"
+
+# Daily 記憶目錄
+DAILY_DIR = Path.home() / ".openclaw" / "workspace" / "memory"
 
 # ============================================
 # Session 數據讀取
@@ -63,6 +71,44 @@ def get_active_session_id() -> str:
         return None
 
 
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"]+)"')
+
+# Python 3.11+ 的 fromisoformat 已支援 'Z' 後綴，免去每行一次 replace
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
+
+def _parse_timestamp(timestamp_str):
+    """解析 ISO 時間戳並轉為 naive datetime"""
+    if not _FROMISO_HANDLES_Z and timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp_str).replace(tzinfo=None)
+
+
+def _find_tail_offset(f, cutoff_time):
+    """從檔尾逐行往回掃描，返回第一條不早於 cutoff_time 的行的位元組偏移
+
+    只用正則提取 timestamp 欄位，不做完整 JSON 解析；
+    精確的時間過濾仍由正向解析完成。
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # 空檔案
+        return 0
+
+    with mm:
+        end = len(mm)
+        while end > 0:
+            start = mm.rfind(b'\n', 0, end - 1) + 1
+            match = _TIMESTAMP_RE.search(mm, start, end)
+            if match:
+                try:
+                    if _parse_timestamp(match.group(1).decode()) < cutoff_time:
+                        return end
+                except ValueError:
+                    pass
+            end = start
+    return 0
+
 def read_session_messages(session_id: str, hours: int = 1) -> list:
     """讀取 session 對話內容（最近 N 小時）"""
     session_file = SESSIONS_DIR / f"{session_id}.jsonl"
@@ -75,7 +121,9 @@ def read_session_messages(session_id: str, hours: int = 1) -> list:
     cutoff_time = datetime.now() - timedelta(hours=hours)
     
     try:
-        with open(session_file, 'r', encoding='utf-8') as f:
+        with open(session_file, 'rb') as f:
+            # 跳過 cutoff 之前的舊消息，只解析檔尾
+            f.seek(_find_tail_offset(f, cutoff_time))
             for line in f:
                 if not line.strip():
                     continue
@@ -91,8 +139,7 @@ def read_session_messages(session_id: str, hours: int = 1) -> list:
                         continue
                     
                     try:
-                        msg_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                        msg_time = msg_time.replace(tzinfo=None)
+                        msg_time = _parse_timestamp(timestamp_str)
                     except:
                         continue
                     
@@ -143,13 +190,18 @@ def identify_important_content(messages: list) -> list:
     important = []
     
     for msg in messages:
+        # 只有 AI 回應會被保存，其餘消息不必分類
+        if msg['role'] != 'assistant':
+            continue
+        
         content = msg['content']
         
-        # 排除規則（v3.3 基礎）
+        # 排除規則（v3.3 基礎）：廉價過濾先行
         if len(content) < 30:
             continue
         
-        if 'HEARTBEAT.md' in content or 'Read HEARTBEAT.md' in content:
+        # 'Read HEARTBEAT.md' 已包含 'HEARTBEAT.md'，一次子串檢查即可
+        if 'HEARTBEAT.md' in content:
             continue
         
         # v3.3: 使用分層關鍵詞字典
@@ -161,7 +213,7 @@ def identify_important_content(messages: list) -> list:
             priority = 'C'
         
         # AI 回應且重要
-        if msg['role'] == 'assistant' and (tags or len(content) > 100):
+        if tags or len(content) > 100:
             important.append({
                 'time': msg['time'],
                 'content': content,
@@ -176,25 +228,29 @@ def identify_important_content(messages: list) -> list:
 # 保存到 Daily File（v3.3 支持標籤）
 # ============================================
 
-def save_to_daily_file(content: str, priority: str, tags: list = None) -> str:
+def get_daily_file(now: datetime = None) -> Path:
+    """今日 daily file 路徑（並確保目錄存在）"""
+    now = now or datetime.now()
+    DAILY_DIR.mkdir(parents=True, exist_ok=True)
+    return DAILY_DIR / f"{now.strftime('%Y-%m-%d')}.md"
+
+
+def format_daily_entry(content: str, priority: str, tags: list = None, timestamp: str = None) -> str:
     """
-    保存到 daily file（支持標籤）
+    生成一條 daily file 記錄（header + 內容），不做 I/O
     
     Args:
         content: 內容
         priority: 優先級 [C/I/N]
         tags: [(tag, weight), ...]
+        timestamp: 預先計算的 HH:MM 時間（省略時取當前時間）
     
     Returns:
-        str: daily file 路徑
+        str: 可直接追加到 daily file 的文本
     """
-    today = datetime.now().strftime('%Y-%m-%d')
-    daily_dir = Path.home() / ".openclaw" / "workspace" / "memory"
-    daily_file = daily_dir / f"{today}.md"
+    if timestamp is None:
+        timestamp = datetime.now().strftime('%H:%M')
     
-    daily_dir.mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime('%H:%M')
     header = "\n\n" + "-" * 50 + "\n"
     
     # v3.3: 添加標籤行
@@ -206,10 +262,36 @@ def save_to_daily_file(content: str, priority: str, tags: list = None) -> str:
     header += f"**來源**：Session 對話回顧\n"
     header += f"**時區**：UTC\n\n"
     
-    with open(daily_file, 'a', encoding='utf-8') as f:
-        f.write(header)
-        f.write(content)
-        f.write('\n')
+    return header + content + '\n'
+
+
+def append_to_daily_file(daily_file: Path, entries: list):
+    """一次追加多條記錄到 daily file（單次緩衝寫入）"""
+    if not entries:
+        return
+    with open(daily_file, 'a', encoding='utf-8', buffering=1 << 16) as f:
+        f.write(''.join(entries))
+
+
+def save_to_daily_file(content: str, priority: str, tags: list = None,
+                       daily_file: Path = None, timestamp: str = None) -> str:
+    """
+    保存到 daily file（支持標籤）
+    
+    Args:
+        content: 內容
+        priority: 優先級 [C/I/N]
+        tags: [(tag, weight), ...]
+        daily_file: 預先計算的 daily file 路徑（省略時按今日計算）
+        timestamp: 預先計算的 HH:MM 時間（省略時取當前時間）
+    
+    Returns:
+        str: daily file 路徑
+    """
+    if daily_file is None:
+        daily_file = get_daily_file()
+    
+    append_to_daily_file(daily_file, [format_daily_entry(content, priority, tags, timestamp)])
     
     return str(daily_file)
 
@@ -218,22 +300,103 @@ def save_to_daily_file(content: str, priority: str, tags: list = None) -> str:
 # Daily File 統計
 # ============================================
 
-def check_daily_memory() -> tuple:
-    """檢查今日記憶檔案"""
-    today = datetime.now().strftime('%Y-%m-%d')
-    daily_file = Path.home() / ".openclaw" / "workspace" / "memory" / f"{today}.md"
+_STATS_RE = re.compile(r'\[Auto-Save\]|## \[C\]|## \[I\]')
+
+
+def _count_markers(text: str) -> dict:
+    """統計一段 daily file 文本中的標記數量（單次掃描）"""
+    hits = Counter(_STATS_RE.findall(text))
+    return {
+        'auto_save': hits['[Auto-Save]'],
+        'c': hits['## [C]'],
+        'i': hits['## [I]'],
+    }
+
+
+def _load_day_stats(daily_file: Path) -> dict:
+    """讀取 daily file 的增量統計（文件不符時返回空 dict）"""
+    try:
+        with open(DAY_STATS_FILE, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return stats if stats.get('file') == str(daily_file) else {}
+
+
+# 指紋取已計數前綴的頭尾各一段，用來確認前綴沒有被改寫
+_FINGERPRINT_BYTES = 4096
+
+
+def _prefix_fingerprint(f, size: int) -> str:
+    """計算文件前 size 字節的指紋（頭尾各 _FINGERPRINT_BYTES）"""
+    h = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    h.update(f.read(min(size, _FINGERPRINT_BYTES)))
+    if size > _FINGERPRINT_BYTES:
+        f.seek(max(_FINGERPRINT_BYTES, size - _FINGERPRINT_BYTES))
+        h.update(f.read(size - f.tell()))
+    return h.hexdigest()
+
+
+def _save_day_stats(stats: dict):
+    try:
+        DAY_STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(DAY_STATS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(stats, f)
+    except OSError:
+        pass
+
+
+def check_daily_memory(daily_file: Path = None) -> tuple:
+    """
+    檢查今日記憶檔案
+    
+    計數保存在 DAY_STATS_FILE；文件只被追加時只掃描新增的尾部。
+    已計數前綴的指紋不符（文件被截短或改寫）時重新全量掃描。
+    """
+    if daily_file is None:
+        daily_file = get_daily_file()
+    
+    try:
+        st = daily_file.stat()
+    except OSError:
+        return 0, 0
     
-    if daily_file.exists():
-        with open(daily_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+    stats = _load_day_stats(daily_file)
+    offset = stats.get('size', 0)
+    if stats and offset == st.st_size and stats.get('mtime_ns') == st.st_mtime_ns:
+        counts = stats['counts']
+    else:
+        with open(daily_file, 'rb') as f:
+            if (not stats or offset >= st.st_size
+                    or stats.get('prefix') != _prefix_fingerprint(f, offset)):
+                # 冷啟動或文件被改寫：全量掃描
+                offset = 0
+                counts = {'auto_save': 0, 'c': 0, 'i': 0}
+            else:
+                counts = stats['counts']
+            
+            f.seek(offset)
+            # 只讀到 stat 時的大小，之後的追加留給下次
+            tail = f.read(st.st_size - offset).decode('utf-8', errors='ignore')
+            prefix = _prefix_fingerprint(f, st.st_size)
         
-        # 計算各類標記數量
-        auto_save_count = content.count('[Auto-Save]')
-        heartbeat_extract = content.count('## [C]') + content.count('## [I]') - auto_save_count
+        for key, value in _count_markers(tail).items():
+            counts[key] += value
         
-        return auto_save_count, heartbeat_extract
+        _save_day_stats({
+            'file': str(daily_file),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'prefix': prefix,
+            'counts': counts,
+        })
+    
+    # 計算各類標記數量
+    auto_save_count = counts['auto_save']
+    heartbeat_extract = counts['c'] + counts['i'] - auto_save_count
     
-    return 0, 0
+    return auto_save_count, heartbeat_extract
 
 
 # ============================================
@@ -254,10 +417,15 @@ def main():
     print(f"🏷️  初始化標籤索引...")
     tag_idx = TagIndex(str(TAG_INDEX_FILE))
     
+    # 本次運行的時間與 daily file 只計算一次
+    now = datetime.now()
+    daily_file = get_daily_file(now)
+    timestamp = now.strftime('%H:%M')
+    
     # 檢查現有記憶
-    auto_save_count, heartbeat_extract_count = check_daily_memory()
+    auto_save_count, heartbeat_extract_count = check_daily_memory(daily_file)
     
-    print(f"\n🩺 Heartbeat 記憶檢查 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')} UTC)")
+    print(f"\n🩺 Heartbeat 記憶檢查 ({now.strftime('%Y-%m-%d %H:%M:%S')} UTC)")
     print(f"- [Auto-Save] 條目：{auto_save_count} 條")
     print(f"- [Heartbeat 提取] 條目：{heartbeat_extract_count} 條")
     
@@ -284,56 +452,71 @@ def main():
     saved_count = 0
     skipped_exact = 0
     skipped_similar = 0
+    pending_writes = []
+    saved_items = []
+    out_buf = io.StringIO()
     
+    total_important = len(important)
     for item in important:
-        # v3.3: 獲取分類
+        # v3.3: 獲取分類（每條只取一次欄位，後續使用局部變量）
         tags = item['tags']
-        if tags:
-            category = tags[0][0]  # 使用第一個標籤作為分類
-        else:
-            category = 'General'
+        content = item['content']
+        priority = item['priority']
+        content_len = len(content)
+        category = tags[0][0] if tags else 'General'  # 使用第一個標籤作為分類
         
-        # v3.3: 雙層去重檢查
-        is_dup, dedup_type = dedup.is_duplicate(item['content'], category)
+        # v3.3: 雙層去重檢查（本次運行已保存的內容也在 dedup 記憶體中）
+        is_dup, dedup_type = dedup.is_duplicate(content, category)
         
         if is_dup:
             if dedup_type == 'exact':
                 skipped_exact += 1
-                print(f"  📦 跳過完全相同 [{item['priority']}] - {len(item['content'])} 字")
+                out_buf.write(f"  📦 跳過完全相同 [{priority}] - {content_len} 字\n")
             else:
                 skipped_similar += 1
-                print(f"  🔄 跳過語意相似 [{item['priority']}/{category}] - {len(item['content'])} 字")
+                out_buf.write(f"  🔄 跳過語意相似 [{priority}/{category}] - {content_len} 字\n")
             continue
         
-        # v3.3: 保存內容 + 標籤
-        daily_file = save_to_daily_file(item['content'], item['priority'], tags)
-        
-        # 保存到去重系統
-        dedup.save(item['content'], category)
+        # v3.3: 暫存內容 + 標籤，循環結束後一次寫入
+        pending_writes.append(format_daily_entry(content, priority, tags, timestamp))
+        saved_items.append((item, tags))
         
-        # v3.3: 更新標籤索引
-        update_tag_index(
-            item['content'],
-            item['priority'],
-            tags,
-            daily_file,
-            tag_idx
-        )
+        # 先記入去重記憶體（同批次內也能去重），寫入成功後再持久化
+        dedup.save(content, category, persist=False)
         
         saved_count += 1
-        tag_display = ', '.join([t[0] for t in tags[:2]]) if tags else '無'
-        print(f"  ✅ 保存 [{item['priority']}] {saved_count}/{len(important)} - {len(item['content'])} 字 (標籤: {tag_display})")
+        tag_display = ', '.join(t[0] for t in tags[:2]) if tags else '無'
+        out_buf.write(f"  ✅ 保存 [{priority}] {saved_count}/{total_important} - {content_len} 字 (標籤: {tag_display})\n")
+    
+    # 逐條結果先寫入緩衝，循環結束後一次輸出
+    sys.stdout.write(out_buf.getvalue())
+    
+    if pending_writes:
+        append_to_daily_file(daily_file, pending_writes)
+        dedup.flush()
+        
+        # v3.3: 更新標籤索引（全部加入後只寫一次文件）
+        for item, tags in saved_items:
+            update_tag_index(
+                item['content'],
+                item['priority'],
+                tags,
+                str(daily_file),
+                tag_idx,
+                sync=False
+            )
+        tag_idx.sync()
     
     # 最終報告
     print(f"\n📊 最終狀態:")
-    new_auto_save, new_heartbeat = check_daily_memory()
     
-    if new_auto_save > auto_save_count or new_heartbeat > heartbeat_extract_count:
+    # 本腳本只追加 Heartbeat 條目，是否有新記憶由本次保存數直接決定，無需再讀 daily file
+    if saved_count > 0:
         print(f"✅ 新增記憶已保存")
         print(f"   - 新增: {saved_count} 條")
         print(f"   - 跳過完全相同: {skipped_exact} 條")
         print(f"   - 跳過語意相似: {skipped_similar} 條")
-        print(f"   ↳ 保存至 memory/{datetime.now().strftime('%Y-%m-%d')}.md")
+        print(f"   ↳ 保存至 memory/{daily_file.name}")
         
         # v3.3: 顯示標籤統計
         tag_stats = tag_idx.get_stats()
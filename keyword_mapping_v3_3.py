@@ -5,6 +5,10 @@ Soul Memory Keyword Mapping v3.3 - Generic/Universal Schema
 特性：使用通用術語，無需硬編碼用戶特定字眼
 """
 
+import functools
+import heapq
+from operator import itemgetter
+
 # ============================================
 # 分層關鍵詞字典（通用 Schema）
 # ============================================
@@ -145,7 +149,11 @@ USER_KEYWORDS = {
 # 合併用戶關鍵詞到主映射（可選）
 def merge_user_keywords(user_mapping=None):
     """合併用戶自定義關鍵詞"""
-    merged = KEYWORD_MAPPING.copy()
+    # 複製到層級列表，避免 extend 改寫全局 KEYWORD_MAPPING
+    merged = {
+        category: {layer: list(items) for layer, items in layers.items()}
+        for category, layers in KEYWORD_MAPPING.items()
+    }
     if user_mapping:
         for category, layers in user_mapping.items():
             if category not in merged:
@@ -160,6 +168,38 @@ def merge_user_keywords(user_mapping=None):
 # 分類函數
 # ============================================
 
+def _flatten_mapping(mapping):
+    """將 分類 → 層級 → 條目 的嵌套映射展平為 (keyword, weight, tags) 元組（保持原順序）"""
+    return tuple(
+        (keyword, weight, tuple(tags))
+        for layers in mapping.values()
+        for items in layers.values()
+        for keyword, weight, tags in items
+    )
+
+
+# 預設映射只展平一次
+_DEFAULT_ENTRIES = _flatten_mapping(KEYWORD_MAPPING)
+
+
+def _freeze_mapping(mapping):
+    """將用戶映射轉為可哈希的嵌套元組（作為快取鍵）"""
+    return tuple(
+        (category, tuple(
+            (layer, tuple((keyword, weight, tuple(tags)) for keyword, weight, tags in items))
+            for layer, items in layers.items()
+        ))
+        for category, layers in mapping.items()
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _merged_entries(frozen_mapping):
+    """合併並展平用戶映射（同一映射只合併一次）"""
+    user_mapping = {category: dict(layers) for category, layers in frozen_mapping}
+    return _flatten_mapping(merge_user_keywords(user_mapping))
+
+
 def classify_content(content, custom_mapping=None):
     """
     內容分類（基於分層關鍵詞匹配）
@@ -171,21 +211,22 @@ def classify_content(content, custom_mapping=None):
     Returns:
         list: [(tag, score), ...] 按權重排序的標籤列表
     """
-    mapping = merge_user_keywords(custom_mapping) if custom_mapping else KEYWORD_MAPPING
+    if custom_mapping:
+        entries = _merged_entries(_freeze_mapping(custom_mapping))
+    else:
+        entries = _DEFAULT_ENTRIES
     
     scores = {}
     
-    for category, layers in mapping.items():
-        for layer, items in layers.items():
-            for keyword, weight, tags in items:
-                if keyword in content:
-                    for tag in tags:
-                        if tag not in scores:
-                            scores[tag] = 0
-                        scores[tag] += weight
+    for keyword, weight, tags in entries:
+        if keyword in content:
+            for tag in tags:
+                if tag not in scores:
+                    scores[tag] = 0
+                scores[tag] += weight
     
-    # 返回按權重排序的標籤（取前 5）
-    return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:5]
+    # 返回按權重排序的標籤（取前 5；nlargest 與穩定排序取前 5 結果一致）
+    return heapq.nlargest(5, scores.items(), key=itemgetter(1))
 
 
 def get_priority_from_tags(tags):
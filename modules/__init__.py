@@ -12,13 +12,20 @@ Modules:
 
 __version__ = "2.1.0"
 
-# Make modules available
-from .priority_parser import PriorityParser, Priority, ParsedMemory
-from .vector_search import VectorSearch, SearchResult
-from .dynamic_classifier import DynamicClassifier
-from .version_control import VersionControl
-from .memory_decay import MemoryDecay
-from .auto_trigger import AutoTrigger
+import importlib
+
+# Make modules available (lazy, PEP 562)
+_LAZY_EXPORTS = {
+    'PriorityParser': 'priority_parser',
+    'Priority': 'priority_parser',
+    'ParsedMemory': 'priority_parser',
+    'VectorSearch': 'vector_search',
+    'SearchResult': 'vector_search',
+    'DynamicClassifier': 'dynamic_classifier',
+    'VersionControl': 'version_control',
+    'MemoryDecay': 'memory_decay',
+    'AutoTrigger': 'auto_trigger',
+}
 
 __all__ = [
     'PriorityParser', 'Priority', 'ParsedMemory',
@@ -28,3 +35,16 @@ __all__ = [
     'MemoryDecay',
     'AutoTrigger'
 ]
+
+
+def __getattr__(name):
+    submodule = _LAZY_EXPORTS.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{submodule}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -11,6 +11,7 @@ Date: 2026-02-17
 """
 
 import os
+import re
 import sys
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
@@ -74,16 +75,43 @@ class AutoTrigger:
     Pre-response memory retrieval based on query type.
     """
     
+    # SELECTION_RULES 的單次掃描匹配器（首次使用時建立）
+    _RULE_MATCHER = None
+    
     def __init__(self, memory_system=None):
         self.memory_system = memory_system
     
+    @classmethod
+    def _rule_matcher(cls):
+        """Build (pattern, rank, best) over SELECTION_RULES
+
+        pattern 以零寬 lookahead 找出每個位置最長的命中關鍵詞；
+        best 把它映射到同一位置所有命中（皆為其前綴）中規則順序最靠前者。
+        """
+        if cls._RULE_MATCHER is None:
+            rank = {kw: i for i, kw in enumerate(SELECTION_RULES)}
+            keywords = sorted((kw for kw in rank if kw), key=len, reverse=True)
+            pattern = None
+            if keywords:
+                pattern = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))')
+            best = {
+                kw: min((k for k in keywords if kw.startswith(k)), key=rank.__getitem__)
+                for kw in keywords
+            }
+            cls._RULE_MATCHER = (pattern, rank, best)
+        return cls._RULE_MATCHER
+    
     def _detect_category(self, query: str) -> str:
         """Detect query category"""
-        query_lower = query.lower()
+        pattern, rank, best = self._rule_matcher()
+        if '' in rank:
+            return SELECTION_RULES['']
+        if pattern is None:
+            return "General"
         
-        for keyword, category in SELECTION_RULES.items():
-            if keyword in query_lower:
-                return category
+        hits = {best[kw] for kw in set(pattern.findall(query.lower()))}
+        if hits:
+            return SELECTION_RULES[min(hits, key=rank.__getitem__)]
         
         return "General"
     
@@ -111,8 +111,10 @@ class ContextQualityScorer:
         Returns:
             相關性分數 (0-1)
         """
-        query_terms = set(query.lower().split())
-        context_terms = set(context.lower().split())
+        query_lower = query.lower()
+        context_lower = context.lower()
+        query_terms = set(query_lower.split())
+        context_terms = set(context_lower.split())
         
         if not query_terms or not context_terms:
             return 0.0
@@ -123,11 +125,11 @@ class ContextQualityScorer:
         
         jaccard = len(intersection) / len(union) if union else 0
         
-        # 關鍵詞匹配增強
+        # 關鍵詞匹配增強（小寫只算一次；先查較短的查詢，命中才掃描上下文）
         keyword_bonus = 0.0
         important_keywords = ['如何', '為什麼', '什麼', '怎樣', 'where', 'what', 'why', 'how']
         for kw in important_keywords:
-            if kw in query.lower() and kw in context.lower():
+            if kw in query_lower and kw in context_lower:
                 keyword_bonus += 0.1
         
         return min(1.0, jaccard * 0.7 + keyword_bonus)
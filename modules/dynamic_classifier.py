@@ -11,19 +11,33 @@ Date: 2026-02-17
 """
 
 import os
+import sys
 import json
 import re
-from typing import Dict, List, Optional, Set
+import atexit
+from typing import Dict, FrozenSet, List, Optional, Set, Union
 from dataclasses import dataclass, field
 from pathlib import Path
 from collections import Counter
 
+# 學習時提取關鍵詞（>= 3 字元）
+_WORD_RE = re.compile(r'\w{3,}')
 
-@dataclass
+
+def _seed(*keywords: str) -> FrozenSet[str]:
+    """Interned, shared keyword set for a built-in category"""
+    return frozenset(sys.intern(kw) for kw in keywords)
+
+
+# Python 3.10+ 的 dataclass 支援 slots：省記憶體、加快屬性存取；舊版照常運行
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class Category:
     """Memory category"""
     name: str
-    keywords: Set[str] = field(default_factory=set)
+    keywords: Union[Set[str], FrozenSet[str]] = field(default_factory=set)
     count: int = 0
 
 
@@ -35,19 +49,25 @@ class DynamicClassifier:
     Supports custom category rules.
     """
     
+    # learn() 每累計多少次才寫盤
+    SAVE_EVERY = 20
+    
     # Default categories (generic, neutral)
+    # 模組載入時建立一次的共享 frozenset；分類學習時才複製為可變 set（copy-on-write）
     DEFAULT_CATEGORIES = {
-        "User_Identity": {"user", "preferences", "identity", "用戶", "喜好", "身份"},
-        "Tech_Config": {"config", "api", "ssh", "key", "設定", "配置"},
-        "Project": {"project", "task", "work", "專案", "項目", "工作"},
-        "Science": {"theory", "physics", "science", "理論", "物理", "科學"},
-        "History": {"history", "past", "before", "歷史", "之前"},
-        "Memory": {"memory", "remember", "記憶", "記住"},
-        "General": {"general", "chat", "日常", "閒聊"}
+        "User_Identity": _seed("user", "preferences", "identity", "用戶", "喜好", "身份"),
+        "Tech_Config": _seed("config", "api", "ssh", "key", "設定", "配置"),
+        "Project": _seed("project", "task", "work", "專案", "項目", "工作"),
+        "Science": _seed("theory", "physics", "science", "理論", "物理", "科學"),
+        "History": _seed("history", "past", "before", "歷史", "之前"),
+        "Memory": _seed("memory", "remember", "記憶", "記住"),
+        "General": _seed("general", "chat", "日常", "閒聊")
     }
     
     def __init__(self, cache_path: Optional[Path] = None):
         self.categories: Dict[str, Category] = {}
+        self._matcher = None  # 關鍵詞多模式匹配器，分類變更時重建
+        self._unsaved_changes = 0  # learn() 的累計未保存次數
         self.cache_path = cache_path or Path(__file__).parent.parent / "cache"
         self.cache_path.mkdir(exist_ok=True)
         
@@ -57,6 +77,7 @@ class DynamicClassifier:
     def _load_categories(self):
         """Load categories from cache or use defaults"""
         cache_file = self.cache_path / "categories.json"
+        self._matcher = None
         
         if cache_file.exists():
             with open(cache_file, 'r', encoding='utf-8') as f:
@@ -65,7 +86,7 @@ class DynamicClassifier:
         else:
             # Use defaults
             for name, keywords in self.DEFAULT_CATEGORIES.items():
-                self.categories[name] = Category(name=name, keywords=set(keywords))
+                self.categories[name] = Category(name=name, keywords=keywords)
 
     def load_categories(self, categories):
         """Compatibility loader for cached/indexed categories.
@@ -78,10 +99,11 @@ class DynamicClassifier:
         This keeps older core/index code working without forcing a rebuild.
         """
         self.categories = {}
+        self._matcher = None
 
         if not categories:
             for name, keywords in self.DEFAULT_CATEGORIES.items():
-                self.categories[name] = Category(name=name, keywords=set(keywords))
+                self.categories[name] = Category(name=name, keywords=keywords)
             return
 
         if isinstance(categories, dict):
@@ -97,17 +119,17 @@ class DynamicClassifier:
             for name in categories:
                 if not isinstance(name, str):
                     continue
-                default_keywords = self.DEFAULT_CATEGORIES.get(name, set())
-                self.categories[name] = Category(name=name, keywords=set(default_keywords))
+                default_keywords = self.DEFAULT_CATEGORIES.get(name, frozenset())
+                self.categories[name] = Category(name=name, keywords=default_keywords)
             if self.categories:
                 return
 
         # Fallback to defaults on unknown format
         for name, keywords in self.DEFAULT_CATEGORIES.items():
-            self.categories[name] = Category(name=name, keywords=set(keywords))
+            self.categories[name] = Category(name=name, keywords=keywords)
     
     def _save_categories(self):
-        """Save categories to cache"""
+        """Save categories to cache (atomic replace)"""
         cache_file = self.cache_path / "categories.json"
         data = {
             'categories': {
@@ -115,21 +137,58 @@ class DynamicClassifier:
                 for name, cat in self.categories.items()
             }
         }
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        tmp_file = cache_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        os.replace(tmp_file, cache_file)
+        if self._unsaved_changes:
+            atexit.unregister(self.flush)
+            self._unsaved_changes = 0
+    
+    def flush(self):
+        """Persist pending learn() updates"""
+        if self._unsaved_changes:
+            try:
+                self._save_categories()
+            except OSError:
+                pass
     
+    def _keyword_matcher(self):
+        """Build (pattern, owners) over every category keyword
+
+        pattern 以零寬 lookahead 在每個位置找出最長的命中關鍵詞；
+        同一位置較短的命中必然是其前綴，classify 時按前綴查 owners 補回，
+        結果與逐個 `in` 檢查一致（建表為 O(K)，無需兩兩比較關鍵詞）。
+        """
+        if self._matcher is None:
+            owners: Dict[str, List[str]] = {}
+            for name, cat in self.categories.items():
+                for kw in cat.keywords:
+                    owners.setdefault(kw, []).append(name)
+            keywords = sorted((kw for kw in owners if kw), key=len, reverse=True)
+            pattern = None
+            if keywords:
+                pattern = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))')
+            self._matcher = (pattern, owners)
+        return self._matcher
+
     def classify(self, text: str) -> str:
         """Classify text into a category"""
         text_lower = text.lower()
+        pattern, owners = self._keyword_matcher()
         
-        scores = {}
-        for name, cat in self.categories.items():
-            score = sum(1 for kw in cat.keywords if kw in text_lower)
-            if score > 0:
-                scores[name] = score
+        hits = set()
+        if pattern is not None:
+            for longest in set(pattern.findall(text_lower)):
+                # 最長命中的每個前綴若也是關鍵詞，同樣出現在文本中
+                hits.update(longest[:i] for i in range(1, len(longest) + 1) if longest[:i] in owners)
+        if '' in owners:
+            hits.add('')
         
+        scores = Counter(name for kw in hits for name in owners[kw])
         if scores:
-            return max(scores.keys(), key=lambda x: scores[x])
+            # 同分時取分類順序中較前者
+            return max((name for name in self.categories if name in scores), key=scores.__getitem__)
         
         return "General"
     
@@ -137,14 +196,26 @@ class DynamicClassifier:
         """Learn new category association"""
         if category not in self.categories:
             self.categories[category] = Category(name=category)
+        self._matcher = None
         
-        # Extract keywords (words >= 3 chars)
-        words = re.findall(r'\w{3,}', text.lower())
-        for word in words:
-            self.categories[category].keywords.add(word)
+        # Extract keywords (words >= 3 chars), 一次 findall + set.update 批量加入
+        self._mutable_keywords(self.categories[category]).update(_WORD_RE.findall(text.lower()))
         
         self.categories[category].count += 1
-        self._save_categories()
+        
+        # 去抖：累計 SAVE_EVERY 次才寫盤，其餘由 flush()/退出時保存
+        if not self._unsaved_changes:
+            atexit.register(self.flush)
+        self._unsaved_changes += 1
+        if self._unsaved_changes >= self.SAVE_EVERY:
+            self._save_categories()
+    
+    @staticmethod
+    def _mutable_keywords(cat: Category) -> Set[str]:
+        """共享的 frozenset 在首次修改前複製為該分類私有的 set"""
+        if not isinstance(cat.keywords, set):
+            cat.keywords = set(cat.keywords)
+        return cat.keywords
     
     def add_category(self, name: str, keywords: List[str]):
         """Add a new category with keywords"""
@@ -152,6 +223,7 @@ class DynamicClassifier:
             name=name,
             keywords=set(keywords)
         )
+        self._matcher = None
         self._save_categories()
     
     def get_categories(self) -> List[str]:
@@ -159,6 +231,20 @@ class DynamicClassifier:
         return list(self.categories.keys())
 
 
+# 全局實例
+_global_classifier: Optional[DynamicClassifier] = None
+
+
+def get_classifier() -> DynamicClassifier:
+    """獲取全局分類器實例（只在首次調用時載入 categories.json）"""
+    global _global_classifier
+    
+    if _global_classifier is None:
+        _global_classifier = DynamicClassifier()
+    
+    return _global_classifier
+
+
 if __name__ == "__main__":
     # Test
     classifier = DynamicClassifier()
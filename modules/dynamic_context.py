@@ -10,6 +10,7 @@ v3.4.0 - 新增動態策略選擇
 """
 
 import re
+import sys
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
@@ -114,6 +115,8 @@ class DynamicContextWindow:
         self.strategies = strategies or self.DEFAULT_STRATEGIES.copy()
         self.base_topK = 5
         self.base_min_score = 3.0
+        # 關鍵詞小寫形式只計算一次，避免每次查詢重複 lower()
+        self._technical_keywords_lower = tuple(sys.intern(kw.lower()) for kw in self.TECHNICAL_KEYWORDS)
     
     def analyze_complexity(self, query: str) -> QueryComplexity:
         """
@@ -134,7 +137,7 @@ class DynamicContextWindow:
                 return QueryComplexity.SIMPLE
         
         # 2. 技術關鍵詞計分
-        tech_count = sum(1 for kw in self.TECHNICAL_KEYWORDS if kw.lower() in query_lower)
+        tech_count = sum(1 for kw in self._technical_keywords_lower if kw in query_lower)
         if tech_count >= 2:
             return QueryComplexity.TECHNICAL
         elif tech_count == 1:
@@ -95,8 +95,13 @@ class IncrementalIndexer:
         self.load_index()
     
     def _hash_content(self, content: str) -> str:
-        """計算內容哈希"""
-        return hashlib.md5(content.encode()).hexdigest()
+        """計算內容哈希（blake2b 64-bit）"""
+        return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+    
+    def _upgrade_hash(self, segment: IndexSegment):
+        """舊索引的 MD5 哈希（32 位）改用當前算法重算"""
+        if len(segment.content_hash) == 32:
+            segment.content_hash = self._hash_content(segment.content)
     
     def _generate_segment_id(self) -> str:
         """生成分段 ID"""
@@ -265,7 +270,7 @@ class IncrementalIndexer:
         increment_file.parent.mkdir(parents=True, exist_ok=True)
         
         with open(increment_file, 'w', encoding='utf-8') as f:
-            json.dump(segment.to_dict(), f, ensure_ascii=False, indent=2)
+            f.write(json.dumps(segment.to_dict(), ensure_ascii=False, separators=(',', ':')))
     
     def _save_full_index(self):
         """保存完整索引"""
@@ -279,7 +284,7 @@ class IncrementalIndexer:
         }
         
         with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
     
     def load_index(self):
         """加載索引"""
@@ -295,6 +300,7 @@ class IncrementalIndexer:
             
             for seg_data in data.get('segments', []):
                 segment = IndexSegment.from_dict(seg_data)
+                self._upgrade_hash(segment)
                 self.segments[segment.segment_id] = segment
                 self.content_to_segment[segment.content_hash] = segment.segment_id
             
@@ -319,6 +325,7 @@ class IncrementalIndexer:
                     seg_data = json.load(f)
                 
                 segment = IndexSegment.from_dict(seg_data)
+                self._upgrade_hash(segment)
                 self.segments[segment.segment_id] = segment
                 self.content_to_segment[segment.content_hash] = segment.segment_id
                 self.incremental_count += 1
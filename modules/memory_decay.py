@@ -14,12 +14,31 @@ Date: 2026-02-17
 
 import os
 import json
+import math
+import mmap
+import struct
 import time
-from typing import Dict, List, Tuple, Optional
+from array import array
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Dict, List, Mapping, Tuple, Optional
 from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:  # Windows：無跨進程文件鎖，退回單進程行為
+    fcntl = None
+
+
+# 訪問日誌記錄：訪問時間 (float64) + id 長度 (uint16)，後接 UTF-8 id
+_JOURNAL_HEADER = struct.Struct('<dH')
+
+# heat_map.json 每條記錄的欄位（與列式存儲同序）
+_HEAT_FIELDS = itemgetter('created', 'last_access', 'access_count')
+
 
 @dataclass
 class DecayResult:
@@ -52,100 +71,303 @@ class MemoryDecay:
     THRESHOLD_REVIEW = 0.5    # Review when decay_score < 0.5
     THRESHOLD_ARCHIVE = 0.2   # Archive when decay_score < 0.2
     
+    # 訪問日誌累計多少條後合併回 heat_map.json
+    JOURNAL_COMPACT_EVERY = 500
+    
     def __init__(self, cache_path: Optional[Path] = None):
         self.cache_path = cache_path or Path(__file__).parent.parent / "cache"
         self.cache_path.mkdir(exist_ok=True)
-        self.heat_map: Dict[str, Dict] = {}
-        self._load_heat_map()
+        self.heat_file = self.cache_path / "heat_map.json"
+        self.journal_file = self.cache_path / "heat_map.journal"
+        self.lock_file = self.cache_path / "heat_map.lock"
+        # 列式存儲（SoA）：id → 行號，各欄位為連續的 array，全量掃描不再逐個 dict 取值
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._created = array('d')
+        self._last_access = array('d')
+        self._access_count = array('q')
+        # 每天的對數衰減率 -ln2 / half_life：0.5 ** (d / h) == exp(d * rate)
+        # 不衰減的優先級（Critical）記為 0.0，exp(0) == 1.0，查表即可，無需分支
+        self._log_decay_rates = {
+            priority: -math.log(2) / half_life if half_life else 0.0
+            for priority, half_life in self.HALF_LIVES.items()
+        }
+        self._default_log_decay_rate = -math.log(2) / 30
+        self._journal_entries = 0
+        with self._locked(exclusive=True):
+            self._load_heat_map()
+    
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """跨進程鎖：追加訪問記錄用共享鎖，載入 / 合併日誌用獨佔鎖"""
+        if fcntl is None:
+            yield
+            return
+        
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
     
     def _load_heat_map(self):
-        """Load heat map from cache"""
-        heat_file = self.cache_path / "heat_map.json"
-        if heat_file.exists():
-            with open(heat_file, 'r', encoding='utf-8') as f:
-                self.heat_map = json.load(f)
+        """Load heat map from cache, then replay the access journal (caller holds the lock)"""
+        self._ids = []
+        self._rows = {}
+        self._created = array('d')
+        self._last_access = array('d')
+        self._access_count = array('q')
+        self._journal_entries = 0
+        
+        if self.heat_file.exists():
+            with open(self.heat_file, 'r', encoding='utf-8') as f:
+                heat_map = json.load(f)
+            
+            if heat_map.get('format') == 'columns':
+                self._load_columns(heat_map)
+            else:
+                self._load_records(heat_map)
+        
+        self._replay_journal()
+    
+    def _load_columns(self, data: Dict):
+        """列式快照：每個欄位是一個 JSON 數組，直接轉成 array"""
+        self._ids = data['ids']
+        self._rows = dict(zip(self._ids, range(len(self._ids))))
+        self._created = array('d', data['created'])
+        self._last_access = array('d', data['last_access'])
+        self._access_count = array('q', data['access_count'])
+    
+    def _load_records(self, heat_map: Dict):
+        """舊版快照：{segment_id: {created, last_access, access_count}}"""
+        try:
+            fields = [_HEAT_FIELDS(heat) for heat in heat_map.values()]
+        except KeyError:
+            # 缺欄位的快照：逐條補默認值
+            now = time.time()
+            fields = []
+            for heat in heat_map.values():
+                last_access = heat.get('last_access', now)
+                fields.append((heat.get('created', last_access), last_access,
+                               heat.get('access_count', 0)))
+        
+        # 按欄整批建 array，不逐行 append
+        if fields:
+            created, last_access, access_count = zip(*fields)
+            self._ids = list(heat_map)
+            self._rows = dict(zip(self._ids, range(len(self._ids))))
+            self._created = array('d', created)
+            self._last_access = array('d', last_access)
+            self._access_count = array('q', access_count)
+    
+    @property
+    def heat_map(self) -> Mapping[str, Mapping[str, float]]:
+        """Heat data as {segment_id: {created, last_access, access_count}} (a read-only snapshot)"""
+        # 數據按欄存儲，快照的外層和每條記錄都只讀：寫入拋 TypeError，不會被靜默丟棄（更新請用 record_access）
+        return MappingProxyType({
+            segment_id: MappingProxyType({
+                'created': created,
+                'last_access': last_access,
+                'access_count': access_count
+            })
+            for segment_id, created, last_access, access_count in zip(
+                self._ids, self._created, self._last_access, self._access_count
+            )
+        })
+    
+    def _replay_journal(self):
+        """Apply binary access records (see _JOURNAL_HEADER) on top of the loaded map"""
+        try:
+            f = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            return
+        
+        with f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空日誌
+                return
+            
+            with mm:
+                offset = 0
+                end = len(mm)
+                header_size = _JOURNAL_HEADER.size
+                while offset + header_size <= end:
+                    accessed, id_len = _JOURNAL_HEADER.unpack_from(mm, offset)
+                    id_start = offset + header_size
+                    if id_start + id_len > end or not (0.0 <= accessed < math.inf):
+                        break  # 寫到一半的尾部記錄，或殘缺記錄之後錯位的數據
+                    try:
+                        segment_id = mm[id_start:id_start + id_len].decode('utf-8')
+                    except UnicodeDecodeError:
+                        break
+                    self._apply_access(segment_id, accessed)
+                    self._journal_entries += 1
+                    offset = id_start + id_len
+        
+        # 從第一條壞記錄起截掉（包括其後錯位追加的記錄），避免之後追加的記錄也錯位
+        if offset < end:
+            os.truncate(self.journal_file, offset)
     
     def _save_heat_map(self):
-        """Save heat map to cache"""
-        heat_file = self.cache_path / "heat_map.json"
-        with open(heat_file, 'w', encoding='utf-8') as f:
-            json.dump(self.heat_map, f, ensure_ascii=False, indent=2)
+        """Fold every process's journal records into the snapshot (atomic replace) and reset the journal"""
+        with self._locked(exclusive=True):
+            # 重新載入快照 + 日誌：日誌裡也有其他進程追加的訪問，合併後不會遺失
+            self._load_heat_map()
+            self._write_snapshot()
+    
+    def _write_snapshot(self):
+        """Write heat_map.json and truncate the journal (caller holds the exclusive lock)"""
+        tmp_file = self.heat_file.with_suffix('.json.tmp')
+        # 緊湊輸出走 json 的 C 編碼器（indent / json.dump 都會退回純 Python 路徑）
+        # 按欄寫出：比逐條 dict 小一半，載入也快得多
+        data = json.dumps({
+            'format': 'columns',
+            'ids': self._ids,
+            'created': self._created.tolist(),
+            'last_access': self._last_access.tolist(),
+            'access_count': self._access_count.tolist()
+        }, ensure_ascii=False, separators=(',', ':'))
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_file, self.heat_file)
+        
+        if self.journal_file.exists():
+            os.truncate(self.journal_file, 0)
+        self._journal_entries = 0
+    
+    def compact(self):
+        """Fold the access journal into heat_map.json"""
+        if self._journal_entries:
+            self._save_heat_map()
+    
+    def _apply_access(self, segment_id: str, now: float):
+        row = self._rows.get(segment_id)
+        if row is None:
+            self._rows[segment_id] = len(self._ids)
+            self._ids.append(segment_id)
+            self._created.append(now)
+            self._last_access.append(now)
+            self._access_count.append(1)
+        else:
+            self._last_access[row] = now
+            self._access_count[row] += 1
     
     def record_access(self, segment_id: str):
         """Record memory access for heat tracking"""
         now = time.time()
-        if segment_id not in self.heat_map:
-            self.heat_map[segment_id] = {
-                'created': now,
-                'last_access': now,
-                'access_count': 0
-            }
+        self._apply_access(segment_id, now)
         
-        self.heat_map[segment_id]['last_access'] = now
-        self.heat_map[segment_id]['access_count'] += 1
-        self._save_heat_map()
+        # 只追加一條定長頭 + id 的二進制記錄，不重寫整個 heat map；累計足夠後再合併
+        id_bytes = segment_id.encode('utf-8')
+        with self._locked(exclusive=False):
+            with open(self.journal_file, 'ab') as f:
+                f.write(_JOURNAL_HEADER.pack(now, len(id_bytes)) + id_bytes)
+        self._journal_entries += 1
+        
+        if self._journal_entries >= self.JOURNAL_COMPACT_EVERY:
+            self._save_heat_map()
     
     def calculate_decay(self, segment_id: str, priority: str) -> DecayResult:
         """Calculate decay for a memory segment"""
-        now = time.time()
+        return self.calculate_decays([(segment_id, priority)])[0]
+    
+    def calculate_decays(self, items: List[Tuple[str, str]],
+                         now: Optional[float] = None) -> List[DecayResult]:
+        """Calculate decay for many (segment_id, priority) pairs against one clock reading"""
+        if now is None:
+            now = time.time()
         
-        # Get or create heat data
-        if segment_id in self.heat_map:
-            heat = self.heat_map[segment_id]
-            last_access = heat.get('last_access', now)
-            created = heat.get('created', now)
-        else:
-            last_access = now
-            created = now
+        rows = self._rows
+        last_access_col = self._last_access
+        rate_of = self._log_decay_rates.get
+        default_rate = self._default_log_decay_rate
+        exp = math.exp
+        threshold_review = self.THRESHOLD_REVIEW
+        threshold_archive = self.THRESHOLD_ARCHIVE
         
-        age_seconds = now - last_access
-        age_days = age_seconds / 86400
+        results = []
+        for segment_id, priority in items:
+            # Get heat data (unseen segments count as just accessed)
+            row = rows.get(segment_id)
+            last_access = last_access_col[row] if row is not None else now
+            
+            age_days = (now - last_access) / 86400
+            
+            # Calculate decay score (Critical's rate is 0.0, so it stays at 1.0)
+            decay_score = exp(age_days * rate_of(priority, default_rate))
+            
+            # Determine recommendation
+            if decay_score > threshold_review:
+                recommendation = 'keep'
+            elif decay_score > threshold_archive:
+                recommendation = 'review'
+            else:
+                recommendation = 'archive'
+            
+            results.append(DecayResult(
+                segment_id=segment_id,
+                priority=priority,
+                age_days=age_days,
+                decay_score=decay_score,
+                recommendation=recommendation
+            ))
         
-        # Calculate decay score
-        if priority == 'C':
-            # Critical: never decay
-            decay_score = 1.0
-        else:
-            half_life_days = self.HALF_LIVES.get(priority, 30)
-            decay_score = 0.5 ** (age_days / half_life_days)
-        
-        # Determine recommendation
-        if decay_score > self.THRESHOLD_REVIEW:
-            recommendation = 'keep'
-        elif decay_score > self.THRESHOLD_ARCHIVE:
-            recommendation = 'review'
-        else:
-            recommendation = 'archive'
-        
-        return DecayResult(
-            segment_id=segment_id,
-            priority=priority,
-            age_days=age_days,
-            decay_score=decay_score,
-            recommendation=recommendation
-        )
-    
-    def get_cleanup_recommendations(self, segments: List[Dict]) -> Dict[str, List[str]]:
-        """Get cleanup recommendations for all segments"""
+        return results
+    
+    def get_cleanup_recommendations(self, segments: List[Dict],
+                                    now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Get cleanup recommendations for all segments (read-only: never persists heat data)"""
         recommendations = {
             'keep': [],
             'review': [],
             'archive': []
         }
         
+        keep = recommendations['keep']
+        review = recommendations['review']
+        archive = recommendations['archive']
+        
+        # 單次掃描：衰減與分桶合併，不建立 DecayResult
+        if now is None:
+            now = time.time()
+        rows = self._rows
+        last_access_col = self._last_access
+        rate_of = self._log_decay_rates.get
+        default_rate = self._default_log_decay_rate
+        threshold_review = self.THRESHOLD_REVIEW
+        threshold_archive = self.THRESHOLD_ARCHIVE
+        exp = math.exp
+        
         for seg in segments:
-            seg_id = seg.get('id', 'unknown')
+            segment_id = seg.get('id', 'unknown')
             priority = seg.get('priority', 'N')
-            result = self.calculate_decay(seg_id, priority)
-            recommendations[result.recommendation].append(seg_id)
+            if priority == 'C':
+                keep.append(segment_id)
+                continue
+            
+            row = rows.get(segment_id)
+            if row is None:
+                keep.append(segment_id)
+                continue
+            
+            age_days = (now - last_access_col[row]) / 86400
+            decay_score = exp(age_days * rate_of(priority, default_rate))
+            if decay_score > threshold_review:
+                keep.append(segment_id)
+            elif decay_score > threshold_archive:
+                review.append(segment_id)
+            else:
+                archive.append(segment_id)
         
         return recommendations
     
     def get_decay_stats(self) -> Dict:
         """Get decay statistics"""
         return {
-            'total_segments': len(self.heat_map),
-            'heat_map_entries': len(self.heat_map)
+            'total_segments': len(self._ids),
+            'heat_map_entries': len(self._ids)
         }
 
 
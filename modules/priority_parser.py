@@ -16,6 +16,7 @@ Priority Levels:
 """
 
 import re
+import sys
 from enum import Enum
 from dataclasses import dataclass
 from typing import Optional, Tuple
@@ -27,7 +28,14 @@ class Priority(Enum):
     NORMAL = "N"     # Normal: daily chat
 
 
-@dataclass
+# 標籤字母（與 PRIORITY_PATTERN 的 [CIN] + IGNORECASE 對應的 ASCII 部分）
+_TAG_CHARS = frozenset('CINcin')
+
+# Python 3.10+ 的 dataclass 支援 slots：省記憶體、加快屬性存取；舊版照常運行
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class ParsedMemory:
     """Parsed memory item"""
     original: str        # Original text
@@ -60,25 +68,60 @@ class PriorityParser:
         'en': ['like', 'dislike', 'project', 'progress', 'schedule', 'view', 'thought']
     }
     
+    # 關鍵詞交替正則（首次使用時編譯）
+    _KEYWORD_PATTERNS = None
+    
     def __init__(self):
         pass
     
+    @staticmethod
+    def _alternation(*keyword_maps):
+        """Compile keywords into one alternation pattern (None when there are none)"""
+        words = {
+            kw
+            for keywords in keyword_maps
+            for kws in keywords.values()
+            for kw in kws if kw
+        }
+        words = sorted(words, key=len, reverse=True)
+        return re.compile('|'.join(map(re.escape, words))) if words else None
+    
+    @classmethod
+    def _keyword_patterns(cls):
+        """Build (any_keyword, critical) alternation patterns
+
+        一次 re.search 等同對所有關鍵詞逐個做 `kw in text`。大多數文本不含任何
+        關鍵詞，any_keyword 一次掃描即可排除；命中後才從首個命中位置查 critical。
+        """
+        if cls._KEYWORD_PATTERNS is None:
+            cls._KEYWORD_PATTERNS = (
+                cls._alternation(cls.CRITICAL_KEYWORDS, cls.IMPORTANT_KEYWORDS),
+                cls._alternation(cls.CRITICAL_KEYWORDS)
+            )
+        return cls._KEYWORD_PATTERNS
+    
     def parse(self, text: str) -> ParsedMemory:
         """
         Parse memory text to extract priority
         """
         # Step 1: Check for explicit priority tag
-        match = self.PRIORITY_PATTERN.match(text)
-        if match:
-            tag = match.group(1).upper()
-            priority = Priority(tag)
-            content = text[match.end():].strip()
-            return ParsedMemory(
-                original=text,
-                priority=priority,
-                content=content,
-                has_explicit_tag=True
-            )
+        # 逐位置比較字符代替正則：跳過前導空白（\s 與 str.isspace 等價）後檢查 "[X]"，
+        # 只有 '[' 開頭但不是 ASCII 標籤字母的少見情況才交給正則
+        start = len(text) - len(text.lstrip()) if text[:1].isspace() else 0
+        if text[start:start + 1] == '[':
+            if text[start + 2:start + 3] == ']' and text[start + 1] in _TAG_CHARS:
+                tag, end = text[start + 1].upper(), start + 3
+            else:
+                match = self.PRIORITY_PATTERN.match(text)
+                tag, end = (match.group(1).upper(), match.end()) if match else (None, 0)
+            
+            if tag is not None:
+                return ParsedMemory(
+                    original=text,
+                    priority=Priority(tag),
+                    content=text[end:].strip(),
+                    has_explicit_tag=True
+                )
         
         # Step 2: Semantic detection fallback
         priority = self._detect_priority_semantic(text)
@@ -92,28 +135,40 @@ class PriorityParser:
     def _detect_priority_semantic(self, text: str) -> Priority:
         """Detect priority using keyword analysis"""
         text_lower = text.lower()
+        any_keyword, critical = self._keyword_patterns()
         
-        # Check for critical keywords
-        if any(kw in text_lower for kw in self.CRITICAL_KEYWORDS['zh']):
-            return Priority.CRITICAL
-        if any(kw in text_lower for kw in self.CRITICAL_KEYWORDS['en']):
-            return Priority.CRITICAL
-        
-        # Check for important keywords
-        if any(kw in text_lower for kw in self.IMPORTANT_KEYWORDS['zh']):
-            return Priority.IMPORTANT
-        if any(kw in text_lower for kw in self.IMPORTANT_KEYWORDS['en']):
+        # No keyword at all: normal (the common case, one scan)
+        match = any_keyword.search(text_lower) if any_keyword is not None else None
+        if match is not None:
+            # Check for critical keywords (none can start before the first hit)
+            if critical is not None and critical.search(text_lower, match.start()):
+                return Priority.CRITICAL
+            
+            # Otherwise the hit was an important keyword
             return Priority.IMPORTANT
         
         # Default to normal
         return Priority.NORMAL
 
 
+# 全局實例
+_global_parser: Optional[PriorityParser] = None
+
+
+def get_priority_parser() -> PriorityParser:
+    """獲取全局解析器實例（無狀態，可共用）"""
+    global _global_parser
+    
+    if _global_parser is None:
+        _global_parser = PriorityParser()
+    
+    return _global_parser
+
+
 # Convenience functions
 def parse_priority(text: str) -> str:
     """Quick parse to get priority tag"""
-    parser = PriorityParser()
-    result = parser.parse(text)
+    result = get_priority_parser().parse(text)
     return result.priority.value
 
 
@@ -254,7 +254,7 @@ class SemanticCache:
             }
             
             with open(self.cache_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
         except Exception as e:
             print(f"[SemanticCache] Save failed: {e}")
     
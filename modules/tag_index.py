@@ -5,16 +5,34 @@ Soul Memory Tag Index v3.3
 特性：使用通用術語，無需硬編碼用戶特定字眼
 """
 
+import heapq
 import json
+import os
+import sys
+from contextlib import contextmanager
+from operator import itemgetter
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows：無跨進程文件鎖，退回單進程行為
+    fcntl = None
+
 
 # ============================================
 # 標籤索引類
 # ============================================
 
+# 優先級加權
+PRIORITY_WEIGHTS = {
+    'C': 1.5,
+    'I': 1.2,
+    'N': 1.0
+}
+
+
 class TagIndex:
     """
     標籤索引系統
@@ -23,8 +41,15 @@ class TagIndex:
     - 為每個記憶維護多個標籤
     - 支持標籤組合搜索
     - 按權重排序結果
+    
+    持久化：快照（index_file）+ 追加日誌（同名 .jsonl，每次 add 一行），
+    sync 只追加新條目，日誌累積到 LOG_COMPACT_EVERY 行才重寫快照。
+    追加日誌持共享鎖，合併（重新加載 + 寫快照 + 清空日誌）持獨佔鎖。
     """
     
+    # 追加日誌達到此行數時合併進快照
+    LOG_COMPACT_EVERY = 1000
+    
     def __init__(self, index_file: str = None):
         """
         初始化標籤索引
@@ -33,6 +58,8 @@ class TagIndex:
             index_file (str): 索引文件路徑（可選，持久化）
         """
         self.index_file = Path(index_file) if index_file else None
+        self.log_file = self.index_file.with_suffix('.jsonl') if self.index_file else None
+        self.lock_file = self.index_file.with_suffix('.lock') if self.index_file else None
         
         # 標籤索引: {tag: [{file, line, weight, priority}, ...]}
         self.index: Dict[str, List[Dict]] = {}
@@ -40,9 +67,34 @@ class TagIndex:
         # 反向索引: {file: [tag, ...]}
         self.reverse_index: Dict[str, List[str]] = {}
         
+        # 按 (file, line) 分組的倒排表快取: {tag: {(file, line): [entry, ...]}}（按需建立）
+        self._postings: Dict[str, Dict[Tuple[str, int], List[Dict]]] = {}
+        
+        # 尚未寫入日誌的 add 記錄（sync 時一次追加）
+        self._pending: List[str] = []
+        
+        # 日誌中未合併進快照的行數
+        self._log_entries = 0
+        
         # 從文件加載
-        if self.index_file and self.index_file.exists():
-            self._load_from_file()
+        if self.index_file and (self.index_file.exists() or self.log_file.exists()):
+            with self._locked(exclusive=False):
+                self._load_from_file()
+    
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """跨進程鎖：追加 / 加載日誌用共享鎖，合併日誌用獨佔鎖"""
+        if fcntl is None:
+            yield
+            return
+        
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
     
     def add(self, tags: List[Tuple[str, int]], file: str, line: int, priority: str = 'N'):
         """
@@ -54,16 +106,20 @@ class TagIndex:
             line (int): 行號
             priority (str): 優先級 [C/I/N]
         """
-        file_name = Path(file).name
+        # 同一文件的所有條目共用一個字符串
+        file_name = sys.intern(Path(file).name)
+        self._apply(tags, file_name, line, priority)
+        
+        self._pending.append(json.dumps(
+            {'tags': tags, 'file': file_name, 'line': line, 'priority': priority},
+            ensure_ascii=False, separators=(',', ':')
+        ))
+    
+    def _apply(self, tags: List[Tuple[str, int]], file_name: str, line: int, priority: str):
+        """把一條 add 記錄寫入內存索引（add 與日誌重放共用）"""
+        priority_weight = PRIORITY_WEIGHTS.get(priority, 1.0)
         
         for tag, weight in tags:
-            # 優先級加權
-            priority_weight = {
-                'C': 1.5,
-                'I': 1.2,
-                'N': 1.0
-            }.get(priority, 1.0)
-            
             # 添加標籤索引
             if tag not in self.index:
                 self.index[tag] = []
@@ -77,6 +133,10 @@ class TagIndex:
             }
             
             self.index[tag].append(entry)
+            
+            postings = self._postings.get(tag)
+            if postings is not None:
+                postings.setdefault((file_name, line), []).append(entry)
         
         # 添加反向索引
         if file_name not in self.reverse_index:
@@ -102,45 +162,65 @@ class TagIndex:
         # 收集結果
         results = {}
         
-        for tag in query_tags:
-            if tag not in self.index:
-                continue
-            
-            for entry in self.index[tag]:
-                key = (entry['file'], entry['line'])
-                
-                if operator == 'OR':
-                    # OR: 任何標籤匹配都加入
-                    if key not in results:
-                        results[key] = entry.copy()
-                        results[key]['matched_tags'] = [tag]
-                    else:
-                        results[key]['score'] += entry['score']
-                        results[key]['matched_tags'].append(tag)
-                else:  # AND
-                    # AND: 必須包含所有查詢標籤
-                    if key not in results:
-                        results[key] = entry.copy()
-                        results[key]['matched_tags'] = [tag]
-                    else:
-                        results[key]['matched_tags'].append(tag)
-        
-        # AND: 過濾不匹配所有標籤的結果
         if operator == 'AND':
-            results = {
-                k: v for k, v in results.items()
-                if set(query_tags).issubset(set(v.get('matched_tags', [])))
-            }
+            # AND: 必須包含所有查詢標籤；從最短的倒排表開始求交集，只處理存活的位置
+            postings = [self._postings_for(tag) for tag in dict.fromkeys(query_tags)]
+            postings.sort(key=len)
+            if not postings[0]:
+                return []
+            
+            matched = set(postings[0])
+            for other in postings[1:]:
+                matched.intersection_update(other.keys())
+                if not matched:
+                    return []
+            
+            # 按第一個查詢標籤的倒排順序輸出（與逐條掃描的插入順序一致）
+            for key, entries in self._postings_for(query_tags[0]).items():
+                if key in matched:
+                    result = results[key] = entries[0].copy()
+                    result['matched_tags'] = [
+                        tag
+                        for tag in query_tags
+                        for _ in self._postings_for(tag)[key]
+                    ]
+        else:
+            # OR: 任何標籤匹配都加入並累加分數（其他取值只合併、不累加）
+            add_scores = operator == 'OR'
+            for tag in query_tags:
+                for key, entries in self._postings_for(tag).items():
+                    result = results.get(key)
+                    if result is None:
+                        # 每個位置只複製一次首條記錄（結果交給調用方，不能與索引條目共用）
+                        result = results[key] = entries[0].copy()
+                        result['matched_tags'] = [tag]
+                        entries = entries[1:]
+                    for entry in entries:
+                        if add_scores:
+                            result['score'] += entry['score']
+                        result['matched_tags'].append(tag)
         
         # 按分數排序
         sorted_results = sorted(
             results.values(),
-            key=lambda x: x['score'],
+            key=itemgetter('score'),
             reverse=True
         )
         
         return sorted_results
     
+    def _postings_for(self, tag: str) -> Dict[Tuple[str, int], List[Dict]]:
+        """標籤的倒排表按 (file, line) 分組（保持原始順序；首次查詢時建立）"""
+        postings = self._postings.get(tag)
+        if postings is None:
+            if tag not in self.index:
+                return {}
+            postings = {}
+            for entry in self.index[tag]:
+                postings.setdefault((entry['file'], entry['line']), []).append(entry)
+            self._postings[tag] = postings
+        return postings
+    
     def get_stats(self) -> Dict:
         """
         統計信息
@@ -154,7 +234,7 @@ class TagIndex:
         
         # 計算最常見標籤
         tag_counts = {tag: len(entries) for tag, entries in self.index.items()}
-        top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_tags = heapq.nlargest(10, tag_counts.items(), key=lambda x: x[1])
         
         return {
             'total_tags': total_tags,
@@ -164,7 +244,7 @@ class TagIndex:
         }
     
     def _save_to_file(self):
-        """保存到文件"""
+        """保存快照並清空追加日誌"""
         data = {
             'index': self.index,
             'reverse_index': self.reverse_index,
@@ -174,23 +254,96 @@ class TagIndex:
         if self.index_file:
             self.index_file.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(self.index_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 先寫臨時文件再替換，寫到一半中斷也不會損壞索引
+            tmp_file = self.index_file.with_suffix(self.index_file.suffix + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_file, self.index_file)
+            if self.log_file.exists():
+                os.truncate(self.log_file, 0)
+            self._log_entries = 0
     
     def _load_from_file(self):
-        """從文件加載"""
+        """從文件加載快照，再重放追加日誌"""
+        self.index = {}
+        self.reverse_index = {}
+        self._postings = {}
+        self._log_entries = 0
         try:
-            with open(self.index_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.index = data.get('index', {})
-            self.reverse_index = data.get('reverse_index', {})
+            if self.index_file.exists():
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                
+                # json 為每條記錄各建一份 file / priority / 反向索引標籤字符串，改為共用
+                intern = sys.intern
+                self.index = {intern(tag): entries for tag, entries in data.get('index', {}).items()}
+                self.reverse_index = {
+                    intern(file_name): [intern(tag) for tag in tags]
+                    for file_name, tags in data.get('reverse_index', {}).items()
+                }
+                
+                for entries in self.index.values():
+                    for entry in entries:
+                        entry['file'] = intern(entry['file'])
+                        entry['priority'] = intern(entry['priority'])
         except Exception as e:
             print(f"⚠️ 加載標籤索引失敗: {e}")
+        
+        self._replay_log()
+    
+    def _replay_log(self):
+        """把追加日誌中的 add 記錄套用到已加載的快照上（忽略寫到一半的尾行）"""
+        if not self.log_file.exists():
+            return
+        
+        intern = sys.intern
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(
+                    [(intern(tag), weight) for tag, weight in record['tags']],
+                    intern(record['file']),
+                    record['line'],
+                    intern(record['priority'])
+                )
+                self._log_entries += 1
     
     def sync(self):
-        """同步到文件"""
-        if self.index_file:
+        """把新條目追加到日誌（無變更時跳過）；日誌過長時重寫快照"""
+        if not self.index_file or not self._pending:
+            return
+        
+        self._flush_pending()
+        if self._log_entries >= self.LOG_COMPACT_EVERY:
+            self.compact()
+    
+    def _flush_pending(self):
+        """一次寫入追加所有待寫記錄"""
+        if not self._pending:
+            return
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        data = ('\n'.join(self._pending) + '\n').encode('utf-8')
+        with self._locked(exclusive=False), open(self.log_file, 'ab+') as f:
+            # 日誌以寫到一半的行結尾時先換行，新記錄不會接在殘行後面一起失效
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = b'\n' + data
+            f.write(data)
+        self._log_entries += len(self._pending)
+        self._pending = []
+    
+    def compact(self):
+        """把追加日誌合併進快照（先從磁盤重新加載，保留其他進程追加的記錄）"""
+        if not self.index_file:
+            return
+        self._flush_pending()
+        # 重新加載到清空日誌之間不能有其他進程追加，否則那些記錄會隨日誌一起被清掉
+        with self._locked(exclusive=True):
+            self._load_from_file()
             self._save_to_file()
 
 
@@ -199,7 +352,7 @@ class TagIndex:
 # ============================================
 
 def update_tag_index(content: str, priority: str, tags: List[Tuple[str, int]],
-                     daily_file: str, tag_index: TagIndex = None):
+                     daily_file: str, tag_index: TagIndex = None, sync: bool = True):
     """
     更新標籤索引（集成函數）
     
@@ -209,6 +362,7 @@ def update_tag_index(content: str, priority: str, tags: List[Tuple[str, int]],
         tags (list): [(tag, weight), ...]
         daily_file (str): daily file 路徑
         tag_index (TagIndex): 標籤索引實例
+        sync (bool): 是否立即寫盤（批量更新時傳 False，最後調用一次 tag_index.sync()）
     """
     if not tag_index:
         return
@@ -220,7 +374,8 @@ def update_tag_index(content: str, priority: str, tags: List[Tuple[str, int]],
     tag_index.add(tags, daily_file, line_number, priority)
     
     # 同步到文件
-    tag_index.sync()
+    if sync:
+        tag_index.sync()
 
 
 # ============================================
@@ -300,3 +455,6 @@ if __name__ == '__main__':
     # 清理臨時文件
     import os
     os.unlink(temp_file.name)
+    for path in (tag_idx.log_file, tag_idx.lock_file):
+        if path.exists():
+            os.unlink(path)
@@ -7,15 +7,56 @@ Date: 2026-02-18
 """
 import json
 import hashlib
+import heapq
 import os
 import re
-from dataclasses import dataclass, field
+import sys
+import time
+from collections import Counter
+from operator import itemgetter
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from pathlib import Path
 
 
-@dataclass
+_DATE_RE = re.compile(r'(20\d{2}-\d{2}-\d{2})')
+
+
+@lru_cache(maxsize=4096)
+def _source_recency_bonus(source: str) -> float:
+    """Recency bonus from the date in a source path (memoized: few distinct sources)"""
+    if not source:
+        return 0.0
+
+    match = _DATE_RE.search(source)
+    if not match:
+        return 0.0
+
+    try:
+        date_value = datetime.fromisoformat(match.group(1))
+    except ValueError:
+        return 0.0
+
+    base = datetime(2000, 1, 1)
+    return min(max((date_value - base).days / 36525.0, 0.0), 1.0)
+
+
+def _cjk_bitmap(ranges) -> bytes:
+    """Bitmap over the BMP: bit i set <=> codepoint i falls in one of the ranges"""
+    bitmap = bytearray(0x10000 >> 3)
+    for start, end in ranges:
+        for code in range(start, min(end, 0xFFFF) + 1):
+            bitmap[code >> 3] |= 1 << (code & 7)
+    return bytes(bitmap)
+
+
+# Python 3.10+ 的 dataclass 支援 slots：省記憶體、加快屬性存取；舊版照常運行
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class SearchResult:
     """Search result"""
     content: str
@@ -26,7 +67,7 @@ class SearchResult:
     priority: str = "N"
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class MemorySegment:
     """Memory segment"""
     id: str
@@ -36,6 +77,11 @@ class MemorySegment:
     category: str = ""
     priority: str = "N"
     keywords: List[str] = field(default_factory=list)
+    # 小寫內容只在建立時算一次，搜索時不再逐次 lower()
+    content_lower: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.content_lower = self.content.lower()
 
 
 class VectorSearch:
@@ -55,116 +101,157 @@ class VectorSearch:
         (0x30A0, 0x30FF),
     ]
     
+    # 分詞正則（首次使用時按 CJK_RANGES 編譯）
+    _TOKEN_RE = None
+    # BMP 碼位的 CJK 位圖（8 KB）：bit i 表示碼位 i 屬於 CJK_RANGES
+    _CJK_BITMAP = _cjk_bitmap(CJK_RANGES)
+    
+    # 優先級加權：命中分數加分（Critical +3 / Important +1.5 / Normal +0.5），以及同分時的排序權重
+    PRIORITY_BOOST = {'C': 3.0, 'I': 1.5, 'N': 0.5}
+    PRIORITY_SORT_WEIGHT = {'C': 10, 'I': 5, 'N': 0}
+    
+    # 搜索結果快取：最多保留的查詢數與有效期（秒）；索引變更時整體失效
+    SEARCH_CACHE_SIZE = 128
+    SEARCH_CACHE_TTL = 60.0
+    
     SEMANTIC_EXPANSIONS = {
-        "user": ["用戶", "user", "preferences"],
-        "preferences": ["喜好", "偏好", "喜歡"],
-        "config": ["配置", "設定", "settings"],
-        "api": ["API", "接口", "endpoint"],
-        "memory": ["記憶", "memory", "context"],
-        "project": ["專案", "項目", "project"],
-        "task": ["任務", "工作", "task"],
+        "user": frozenset(["用戶", "user", "preferences"]),
+        "preferences": frozenset(["喜好", "偏好", "喜歡"]),
+        "config": frozenset(["配置", "設定", "settings"]),
+        "api": frozenset(["API", "接口", "endpoint"]),
+        "memory": frozenset(["記憶", "memory", "context"]),
+        "project": frozenset(["專案", "項目", "project"]),
+        "task": frozenset(["任務", "工作", "task"]),
     }
 
     def __init__(self):
         self.segments: List[MemorySegment] = []
-        self.keyword_index: Dict[str, List[str]] = {}
+        # keyword -> rows (positions) of segments containing it (postings)
+        # 以整數行號代替 id 字串：計數與排序都是整數運算，無需字串哈希
+        self.keyword_index: Dict[str, Set[int]] = {}
+        # segment id -> position of its first segment (keeps tie order stable)
+        self._positions: Dict[str, int] = {}
+        # row -> summed priority boost of every segment sharing that row's id
+        self._row_boosts: List[float] = []
+        # query -> expanded keywords (only depends on the query text)
+        self._expanded_keywords = lru_cache(maxsize=1024)(self._expand_query_uncached)
+        # (query, top_k, min_score) -> (cached at, results), oldest first
+        self._search_cache: Dict[Tuple[str, int, float], Tuple[float, List[SearchResult]]] = {}
+        self.cache_stats = {'cache_hits': 0, 'cache_misses': 0}
 
     def _is_cjk(self, char: str) -> bool:
         """Check if character is CJK"""
         code = ord(char)
+        if code <= 0xFFFF:
+            # 一次位圖讀取代替逐個區間比較
+            return self._CJK_BITMAP[code >> 3] >> (code & 7) & 1 == 1
         for start, end in self.CJK_RANGES:
             if start <= code <= end:
                 return True
         return False
 
+    @classmethod
+    def _token_pattern(cls):
+        """Tokenizer: one CJK char per token, or a run of other alphanumerics
+
+        `[^\\W_]` 與 str.isalnum() 等價，再減去 CJK 範圍，一次 findall 完成逐字符分詞。
+        """
+        if cls._TOKEN_RE is None:
+            cjk = ''.join(f'{chr(start)}-{chr(end)}' for start, end in cls.CJK_RANGES)
+            cls._TOKEN_RE = re.compile(f'([{cjk}])|([^\\W_{cjk}]+)')
+        return cls._TOKEN_RE
+
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract keywords (v2.2 CJK智能分词)"""
-        text = re.sub(r"[#*_`\[\](){}]", " ", text)
-        
-        result = []
-        current_word = ""
-        
-        for char in text:
-            if self._is_cjk(char):
-                if current_word:
-                    result.append(current_word)
-                    current_word = ""
-                result.append(char)
-            elif char.isalnum():
-                current_word += char
-            else:
-                if current_word:
-                    result.append(current_word)
-                    current_word = ""
-        
-        if current_word:
-            result.append(current_word)
-        
+        # Markdown 符號 #*_`[](){} 既非字母數字也非 CJK，分詞時本身就是分隔符，無需先替換
         keywords = []
-        i = 0
-        while i < len(result):
-            word = result[i]
-            if len(word) >= 1:
+        prev_cjk = ""
+        for cjk, word in self._token_pattern().findall(text):
+            if cjk:
+                # Create bigram for adjacent CJK characters
+                if prev_cjk:
+                    keywords.append((prev_cjk + cjk).lower())
+                keywords.append(cjk.lower())
+            else:
                 keywords.append(word.lower())
-            # Create bigram for adjacent CJK characters (single chars only)
-            if i + 1 < len(result) and len(word) == 1 and len(result[i+1]) == 1:
-                if self._is_cjk(word) and self._is_cjk(result[i+1]):
-                    bigram = word + result[i+1]
-                    keywords.append(bigram.lower())
-            i += 1
-        
-        seen = set()
-        filtered = []
-        for k in keywords:
-            if k not in seen and len(k) >= 1:
-                seen.add(k)
-                filtered.append(k)
+            prev_cjk = cjk
         
-        return filtered
+        # 去重並保持首次出現順序（token 皆非空）
+        return list(dict.fromkeys(keywords))
 
     def _expand_query(self, query: str) -> List[str]:
         """Expand query with semantic synonyms"""
+        return list(self._expanded_keywords(query))
+
+    def _expand_query_uncached(self, query: str) -> Tuple[str, ...]:
         keywords = self._extract_keywords(query)
         expanded = set(keywords)
+        # 每個查詢詞只做一次字典查找（O(W)），不掃描整個擴展表
+        expansions = self.SEMANTIC_EXPANSIONS
         for kw in keywords:
-            if kw in self.SEMANTIC_EXPANSIONS:
-                expanded.update(self.SEMANTIC_EXPANSIONS[kw])
-        return list(expanded)
+            if kw in expansions:
+                expanded.update(expansions[kw])
+        return tuple(expanded)
 
     def _source_recency_bonus(self, source: str) -> float:
         """Prefer newer memories when scores tie."""
-        if not source:
-            return 0.0
-
-        match = re.search(r'(20\d{2}-\d{2}-\d{2})', source)
-        if not match:
-            return 0.0
+        return _source_recency_bonus(source)
 
-        try:
-            date_value = datetime.fromisoformat(match.group(1))
-        except ValueError:
-            return 0.0
-
-        base = datetime(2000, 1, 1)
-        return min(max((date_value - base).days / 36525.0, 0.0), 1.0)
+    @staticmethod
+    def _intern_keywords(keywords: List[str]) -> List[str]:
+        """Share one string object per distinct keyword across all segments"""
+        return [sys.intern(kw) for kw in keywords]
 
     def add_segment(self, segment: Dict[str, Any]):
         """Add a memory segment"""
+        content = segment['content']
+        
+        # dict.get 的默認值會被立即求值：只在缺少時才計算 id / 關鍵詞
+        seg_id = segment['id'] if 'id' in segment else hashlib.md5(content.encode()).hexdigest()[:8]
+        keywords = segment['keywords'] if 'keywords' in segment else self._extract_keywords(content)
+        
         ms = MemorySegment(
-            id=segment.get('id', hashlib.md5(segment['content'].encode()).hexdigest()[:8]),
-            content=segment['content'],
+            id=seg_id,
+            content=content,
             source=segment.get('source', 'unknown'),
             line_number=segment.get('line_number', 0),
             category=segment.get('category', ''), 
             priority=segment.get('priority', 'N'),
-            keywords=segment.get('keywords', self._extract_keywords(segment['content']))
+            keywords=self._intern_keywords(keywords)
         )
-        self.segments.append(ms)
+        self._register(ms)
+
+    def _register(self, ms: MemorySegment):
+        """Append a segment and add its row to the keyword postings"""
+        row = self._place(ms)
         
+        keyword_index = self.keyword_index
         for kw in ms.keywords:
-            if kw not in self.keyword_index:
-                self.keyword_index[kw] = []
-            self.keyword_index[kw].append(ms.id)
+            postings = keyword_index.get(kw)
+            if postings is None:
+                keyword_index[kw] = {row}
+            else:
+                postings.add(row)
+
+    def _place(self, ms: MemorySegment) -> int:
+        """Append a segment without touching the postings; returns its row"""
+        seg_id = ms.id
+        if self._search_cache:
+            self._search_cache.clear()
+        
+        # 相同 id 的 segment 共用第一次出現的行號
+        row = self._positions.setdefault(seg_id, len(self.segments))
+        self.segments.append(ms)
+        
+        # 優先級加權在加入時累計到行上，搜索時無需再遍歷所有 segment
+        self._row_boosts.append(0.0)
+        self._row_boosts[row] += self.PRIORITY_BOOST.get(ms.priority, 0.5)
+        return row
+
+    def add_segments(self, segments: List[Dict[str, Any]]):
+        """Add multiple memory segments"""
+        for segment in segments:
+            self.add_segment(segment)
 
     def search(self, query: str, top_k: int = 5, min_score: float = 0.0) -> List[SearchResult]:
         """
@@ -177,83 +264,92 @@ class VectorSearch:
         
         v3.4.1: 新增 min_score 參數支持
         """
-        query_keywords = self._expand_query(query)
-        scores = {}
-        matches_count = {}  # 記錄每個 segment 匹配的關鍵詞數量
+        # 重複查詢直接取快取（LRU + TTL；加入或重新加載 segment 時清空）
+        key = (query, top_k, min_score)
+        cache = self._search_cache
+        now = time.monotonic()
+        cached = cache.pop(key, None)
+        if cached is not None and now - cached[0] < self.SEARCH_CACHE_TTL:
+            cache[key] = cached
+            self.cache_stats['cache_hits'] += 1
+            return [replace(r) for r in cached[1]]
+        
+        self.cache_stats['cache_misses'] += 1
+        results = self._search_uncached(query, top_k, min_score)
+        cache[key] = (now, results)
+        if len(cache) > self.SEARCH_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        # 調用方拿到的是副本，修改結果不會影響快取
+        return [replace(r) for r in results]
+
+    def _search_uncached(self, query: str, top_k: int, min_score: float) -> List[SearchResult]:
+        query_keywords = self._expanded_keywords(query)
 
         # 計算每個 segment 的基礎分數（關鍵詞匹配數量，不是匹配次數）
-        for seg in self.segments:
-            matched_keywords = 0
-            for kw in query_keywords:
-                if kw in seg.keywords:
-                    matched_keywords += 1
-
-            if matched_keywords > 0:
-                scores[seg.id] = matched_keywords
-                matches_count[seg.id] = matched_keywords
-
-        # 添加優先級加權
-        for seg in self.segments:
-            if seg.id in scores:
-                priority_boost = {
-                    'C': 3.0,  # Critical: +3 分
-                    'I': 1.5,  # Important: +1.5 分
-                    'N': 0.5,  # Normal: +0.5 分
-                }.get(seg.priority, 0.5)
-                scores[seg.id] += priority_boost
-
-        # 排序：綜合分數優先，優先級其次
-        def sort_key(item):
-            seg_id, score = item
-            seg = next((s for s in self.segments if s.id == seg_id), None)
-            if seg:
-                # 檢查記憶是否包含完整的查詢字符串（給予額外加權）
-                exact_match_bonus = 0
-                content_lower = seg.content.lower()
-                query_lower = query.lower()
-                if query_lower in content_lower:
-                    exact_match_bonus = 2.0
-
-                priority_weight = {'C': 10, 'I': 5, 'N': 0}.get(seg.priority, 0)
-                recency_bonus = self._source_recency_bonus(seg.source)
-                # 總分 = 關鍵詞匹配 + 優先級加權 + 完整匹配加權
-                total_score = scores[seg_id] + exact_match_bonus + recency_bonus
-                return (total_score, priority_weight, matches_count.get(seg.id, 0), recency_bonus)
-            return (scores[seg_id], 0, 0, 0.0)
-
-        sorted_scores = sorted(scores.items(), key=sort_key, reverse=True)
+        # 只遍歷命中關鍵詞的倒排列表，Counter.update 在 C 層累加整數行號
+        # （成本與命中數成正比；逐行的詞表位圖 popcount 要掃描全部行，並不更快）
+        matched = Counter()
+        for kw in query_keywords:
+            postings = self.keyword_index.get(kw)
+            if postings:
+                matched.update(postings)
+
+        # 行號即插入順序，直接排序整數即可保持同分時的先後
+        segments = self.segments
+        row_boosts = self._row_boosts
+        recency_of = self._source_recency_bonus
+        query_lower = query.lower()
+        priority_weights = self.PRIORITY_SORT_WEIGHT
+
+        # 一次遍歷命中的行算出排序鍵與總分（循環不變量已提到循環外）
+        ranked = []
+        for row in sorted(matched):
+            seg = segments[row]
+            match_count = matched[row]
+            # 檢查記憶是否包含完整的查詢字符串（給予額外加權）
+            exact_match_bonus = 2.0 if query_lower in seg.content_lower else 0.0
+            recency_bonus = recency_of(seg.source)
+            # 總分 = 關鍵詞匹配 + 優先級加權（相同 id 的所有 segment 已預先累計）+ 完整匹配加權 + 新近度
+            total_score = match_count + row_boosts[row] + exact_match_bonus + recency_bonus
+            ranked.append((
+                (total_score, priority_weights.get(seg.priority, 0), match_count, recency_bonus),
+                seg
+            ))
+
+        # 排序：綜合分數優先，優先級其次（同分保持插入順序）
+        # 只需前 limit 個候選：nlargest 為 O(M log k)，結果與穩定排序後切片一致
+        limit = max(top_k * 3, top_k)
+        if 0 < limit < len(ranked):
+            ranked = heapq.nlargest(limit, ranked, key=itemgetter(0))
+        else:
+            ranked.sort(key=itemgetter(0), reverse=True)
+            ranked = ranked[:limit]
         results = []
         seen_results = set()
 
-        for seg_id, score in sorted_scores[: max(top_k * 3, top_k)]:
-            seg = next((s for s in self.segments if s.id == seg_id), None)
-            if seg:
-                # 重新計算總分（包含完整匹配加權）
-                content_lower = seg.content.lower()
-                query_lower = query.lower()
-                exact_match_bonus = 2.0 if query_lower in content_lower else 0.0
-                final_score = scores[seg_id] + exact_match_bonus + self._source_recency_bonus(seg.source)
-                
-                # v3.4.0: 過濾低於 min_score 的結果
-                if final_score < min_score:
-                    continue
-
-                result_key = (seg.content.strip().lower(), seg.source, seg.line_number)
-                if result_key in seen_results:
-                    continue
-                seen_results.add(result_key)
-
-                results.append(SearchResult(
-                    content=seg.content,
-                    score=final_score,
-                    source=seg.source,
-                    line_number=seg.line_number,
-                    category=seg.category,
-                    priority=seg.priority
-                ))
-
-                if len(results) >= top_k:
-                    break
+        for sort_key, seg in ranked:
+            final_score = sort_key[0]
+            # v3.4.0: 過濾低於 min_score 的結果
+            if final_score < min_score:
+                continue
+
+            # 空白字符小寫後不變，先 lower 再 strip 與原來的 strip().lower() 相同
+            result_key = (seg.content_lower.strip(), seg.source, seg.line_number)
+            if result_key in seen_results:
+                continue
+            seen_results.add(result_key)
+
+            results.append(SearchResult(
+                content=seg.content,
+                score=final_score,
+                source=seg.source,
+                line_number=seg.line_number,
+                category=seg.category,
+                priority=seg.priority
+            ))
+
+            if len(results) >= top_k:
+                break
 
         return results
 
@@ -262,60 +358,52 @@ class VectorSearch:
         if not file_path.exists():
             return
         
+        # 逐行串流解析，不把整個文件讀成行列表；區塊先收集，最後批量加入
+        blocks = []
+        source = str(file_path)
+        block_content = None
+        block_start = 0
         with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
-            
-            # 遇到標題（##）
-            if stripped.startswith('##') and not stripped.startswith('###'):
-                # 收集這個標題下方的內容，直到下一個 ## 標題
-                block_content = []
-                block_start = i + 1
-                
-                # 添加標題（移除 ##）
-                title = stripped.lstrip('#').strip()
-                block_content.append(title)
-                i += 1
+            for i, line in enumerate(f):
+                stripped = line.strip()
                 
-                # 收集內容行（跳過空行，直到下一個 ## 標題）
-                while i < len(lines):
-                    next_line = lines[i].strip()
+                # 遇到標題（##）：結束上一個區塊，開始新區塊
+                if stripped.startswith('##') and not stripped.startswith('###'):
+                    if block_content is not None:
+                        blocks.append(self._make_block(block_content, source, block_start))
                     
-                    # 遇到下一個 ## 標題，停止
-                    if next_line.startswith('##') and not next_line.startswith('###'):
-                        break
-                    
-                    # 非空行才加入
-                    if next_line:
-                        block_content.append(next_line)
-                    
-                    i += 1
-                
-                # 將整個區塊合併為一個 segment
-                full_content = ' | '.join(block_content)
-                
-                # 偵測優先級
-                priority = 'N'
-                if '[C]' in full_content:
-                    priority = 'C'
-                elif '[I]' in full_content:
-                    priority = 'I'
+                    # 添加標題（移除 ##）
+                    block_content = [stripped.lstrip('#').strip()]
+                    block_start = i + 1
                 
-                segment = {
-                    'content': full_content,
-                    'source': str(file_path),
-                    'line_number': block_start,
-                    'category': title,
-                    'priority': priority
-                }
-                self.add_segment(segment)
-            else:
-                # 非標題行，單獨跳過
-                i += 1
+                # 收集內容行（跳過空行）；第一個標題之前的行忽略
+                elif block_content is not None and stripped:
+                    block_content.append(stripped)
+        
+        if block_content is not None:
+            blocks.append(self._make_block(block_content, source, block_start))
+        
+        self.add_segments(blocks)
+    
+    def _make_block(self, block_content: List[str], source: str, block_start: int) -> Dict[str, Any]:
+        """將一個 ## 區塊合併為一個 segment dict"""
+        title = block_content[0]
+        full_content = ' | '.join(block_content)
+        
+        # 偵測優先級
+        priority = 'N'
+        if '[C]' in full_content:
+            priority = 'C'
+        elif '[I]' in full_content:
+            priority = 'I'
+        
+        return {
+            'content': full_content,
+            'source': source,
+            'line_number': block_start,
+            'category': title,
+            'priority': priority
+        }
 
     def export_index(self) -> Dict[str, Any]:
         """Export index to dict"""
@@ -332,14 +420,23 @@ class VectorSearch:
                     'keywords': s.keywords
                 }
                 for s in self.segments
-            ]
+            ],
+            # 倒排表一併導出（行號列表，可 JSON 序列化），加載時無需逐個關鍵詞重建
+            'postings': {kw: list(rows) for kw, rows in self.keyword_index.items()}
         }
 
     def load_index(self, data: Dict[str, Any]):
         """Load index from dict"""
         self.segments = []
         self.keyword_index = {}
+        self._positions = {}
+        self._row_boosts = []
+        self._search_cache.clear()
+        
+        # 帶倒排表的導出數據直接恢復倒排表；舊數據按關鍵詞重建
+        postings = data.get('postings')
         for seg_data in data.get('segments', []):
+            keywords = seg_data.get('keywords', [])
             ms = MemorySegment(
                 id=seg_data.get('id', ''),
                 content=seg_data.get('content', ''),
@@ -347,10 +444,12 @@ class VectorSearch:
                 line_number=seg_data.get('line_number', 0),
                 category=seg_data.get('category', ''),
                 priority=seg_data.get('priority', 'N'),
-                keywords=seg_data.get('keywords', [])
+                keywords=list(keywords) if postings is not None else self._intern_keywords(keywords)
             )
-            self.segments.append(ms)
-            for kw in ms.keywords:
-                if kw not in self.keyword_index:
-                    self.keyword_index[kw] = []
-                self.keyword_index[kw].append(ms.id)
\ No newline at end of file
+            if postings is not None:
+                self._place(ms)
+            else:
+                self._register(ms)
+        
+        if postings is not None:
+            self.keyword_index = {sys.intern(kw): set(rows) for kw, rows in postings.items()}
\ No newline at end of file
@@ -15,12 +15,27 @@ Date: 2026-02-17
 import os
 import subprocess
 import json
+import queue
+import threading
+import atexit
+import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
 
 
+# 每個倉庫路徑共用一個背景提交隊列（只啟動一個 worker 線程、只註冊一次退出 flush）
+_git_queues: Dict[str, "queue.Queue"] = {}
+_git_queues_lock = threading.Lock()
+
+
+def _flush_git_queue(git_queue: "queue.Queue"):
+    """讓 worker 立即提交當前批次，並等待隊列清空"""
+    git_queue.put(None)
+    git_queue.join()
+
+
 @dataclass
 class CommitInfo:
     """Git commit information"""
@@ -37,9 +52,13 @@ class VersionControl:
     Git-based version control for memory files.
     """
     
+    # 背景提交：同一時間窗內的提交合併為一次 git commit
+    BATCH_WINDOW = 2.0
+    
     def __init__(self, repo_path: str):
         self.repo_path = Path(repo_path)
         self.versions_file = self.repo_path / "versions.json"
+        self._queue_key = str(self.repo_path.resolve())
     
     def _run_git(self, *args) -> Tuple[bool, str]:
         """Run git command"""
@@ -77,10 +96,15 @@ class VersionControl:
             if not ok:
                 return False, msg
         
-        # Add files
+        # Add files：存在的路徑一次暫存；其餘逐個暫存，單個壞路徑不會讓整批失敗
         if files:
+            existing, missing = [], []
             for f in files:
-                self._run_git('add', f)
+                (existing if (self.repo_path / f).exists() else missing).append(f)
+            if existing:
+                self._run_git('add', '--', *existing)
+            for f in missing:
+                self._run_git('add', '--', f)
         else:
             self._run_git('add', '.')
         
@@ -88,6 +112,59 @@ class VersionControl:
         success, output = self._run_git('commit', '-m', message)
         return success, output
     
+    def commit_async(self, message: str, files: Optional[List[str]] = None):
+        """Queue a commit for the background worker and return immediately"""
+        with _git_queues_lock:
+            git_queue = _git_queues.get(self._queue_key)
+            if git_queue is None:
+                git_queue = _git_queues[self._queue_key] = queue.Queue()
+                threading.Thread(target=self._git_worker, args=(git_queue,), daemon=True).start()
+                atexit.register(_flush_git_queue, git_queue)
+        git_queue.put((message, files))
+    
+    def flush(self):
+        """Block until every queued commit for this repo has been written"""
+        git_queue = _git_queues.get(self._queue_key)
+        if git_queue is not None:
+            _flush_git_queue(git_queue)
+    
+    def _git_worker(self, git_queue: "queue.Queue"):
+        while True:
+            batch = []
+            item = git_queue.get()
+            taken = 1
+            deadline = time.monotonic() + self.BATCH_WINDOW
+            while item is not None:
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = git_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+            try:
+                if batch:
+                    self._commit_batch(batch)
+            finally:
+                for _ in range(taken):
+                    git_queue.task_done()
+    
+    def _commit_batch(self, batch: List[Tuple[str, Optional[List[str]]]]):
+        """Commit a batch of queued changes as one git commit"""
+        messages = [message for message, _files in batch]
+        if any(files is None for _message, files in batch):
+            files = None
+        else:
+            files = list(dict.fromkeys(f for _message, fs in batch for f in fs))
+        
+        if len(messages) == 1:
+            message = messages[0]
+        else:
+            message = f"Batch commit: {len(messages)} changes\n\n" + "\n".join(f"- {m}" for m in messages)
+        self.commit(message, files)
+    
     def get_log(self, max_count: int = 10) -> List[CommitInfo]:
         """Get commit log"""
         if not self.is_git_repo():
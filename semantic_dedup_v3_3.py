@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Soul Memory Semantic Deduplication v3.3
-核心改進：語意相似度去重 + MD5 完全匹配雙層機制
+核心改進：語意相似度去重 + 哈希完全匹配雙層機制
 特性：使用通用術語，無需硬編碼用戶特定字眼
 """
 
@@ -19,7 +19,7 @@ class SemanticDedup:
     """
     語意相似度去重（雙層機制）
     
-    第一層：MD5 完全匹配（快速）
+    第一層：哈希完全匹配（快速）
     第二層：語意相似度檢查（精確）
     """
     
@@ -37,24 +37,27 @@ class SemanticDedup:
         # 已保存的內容（按分類組織）
         self.saved_contents: Dict[str, List[str]] = {}
         
-        # MD5 哈希集合（第一層去重）
+        # 內容哈希集合（第一層去重）
         self.saved_hashes: set = set()
     
+    # 完全匹配層使用的哈希算法（持久化時一併記錄，變更時自動重建）
+    HASH_ALGO = 'blake2b-128'
+    
     def get_content_hash(self, content: str) -> str:
         """
-        計算內容 MD5 哈希
+        計算內容哈希（BLAKE2b-128）
         
         Args:
             content (str): 內容
         
         Returns:
-            str: MD5 哈希（16 進制）
+            str: 哈希（16 進制）
         """
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
     
     def is_duplicate_by_hash(self, content: str) -> bool:
         """
-        第一層：MD5 完全匹配檢查
+        第一層：哈希完全匹配檢查
         
         Args:
             content (str): 內容
@@ -82,11 +85,16 @@ class SemanticDedup:
         if category not in self.saved_contents:
             return False
         
+        # 使用 difflib 計算序列相似度；content 作為 seq1 只設定一次
+        matcher = difflib.SequenceMatcher(None, content)
         for saved in self.saved_contents[category]:
-            # 使用 difflib 計算序列相似度
-            similarity = difflib.SequenceMatcher(None, content, saved).ratio()
+            matcher.set_seq2(saved)
+            
+            # real_quick_ratio / quick_ratio 是 ratio 的上界：先用廉價上界排除不可能達標的項
+            if matcher.real_quick_ratio() <= self.threshold or matcher.quick_ratio() <= self.threshold:
+                continue
             
-            if similarity > self.threshold:
+            if matcher.ratio() > self.threshold:
                 return True
         
         return False
@@ -101,11 +109,11 @@ class SemanticDedup:
         
         Returns:
             (bool, str): (是否重複, 去重類型)
-                          - 'exact': 完全匹配（MD5）
+                          - 'exact': 完全匹配（哈希）
                           - 'similar': 語意相似
                           - 'unique': 唯一
         """
-        # 第一層：MD5 完全匹配
+        # 第一層：哈希完全匹配
         if self.is_duplicate_by_hash(content):
             return True, 'exact'
         
@@ -187,6 +195,7 @@ class PersistentDedup(SemanticDedup):
         data = {
             'threshold': self.threshold,
             'category_based': self.category_based,
+            'hash_algo': self.HASH_ALGO,
             'saved_hashes': list(self.saved_hashes),
             'saved_contents': self.saved_contents
         }
@@ -194,7 +203,7 @@ class PersistentDedup(SemanticDedup):
         self.storage_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(self.storage_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
     
     def _load_from_file(self):
         """從文件加載"""
@@ -211,12 +220,25 @@ class PersistentDedup(SemanticDedup):
             self.category_based = data.get('category_based', True)
             self.saved_hashes = set(data.get('saved_hashes', []))
             self.saved_contents = data.get('saved_contents', {})
+            
+            # 舊版記錄（MD5）：由已保存內容重建哈希
+            if data.get('hash_algo') != self.HASH_ALGO:
+                self.saved_hashes = {
+                    self.get_content_hash(content)
+                    for contents in self.saved_contents.values()
+                    for content in contents
+                }
         except Exception as e:
             print(f"⚠️ 加載去重記錄失敗: {e}")
     
-    def save(self, content: str, category: str = 'General'):
-        """保存內容並持久化"""
+    def save(self, content: str, category: str = 'General', persist: bool = True):
+        """保存內容並持久化（persist=False 時只更新記憶體，稍後用 flush() 寫入）"""
         super().save(content, category)
+        if persist:
+            self._save_to_file()
+
+    def flush(self):
+        """將當前狀態寫入文件"""
         self._save_to_file()
 
 
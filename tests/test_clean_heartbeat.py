@@ -0,0 +1,117 @@
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from clean_heartbeat import _BLANKS_RE, strip_heartbeat_blocks
+
+
+# 原始版本的 DOTALL 正則清理（作為對照）
+_BASELINE_PATTERNS = [
+    r'##\s+\[N\]\s+.*?Heartbeat\s+.*?\n###.*?\n.*?---\s*\n',
+    r'##\s+\[.*?\]\s+.*?Heartbeat.*?\n.*?---\s*\n',
+    r'🔥\s+\[.*?\].*?Heartbeat.*?\*Source:.*?\*\s*\n',
+    r'\d+\.\s+🔥.*?Heartbeat.*?\*Source:.*?\*\s*\n',
+]
+
+
+def _baseline_clean(content):
+    for pattern in _BASELINE_PATTERNS:
+        content = re.sub(pattern, '', content, flags=re.DOTALL | re.MULTILINE)
+    return _BLANKS_RE.sub('\n\n', content)
+
+
+def _clean(content):
+    cleaned, removed = strip_heartbeat_blocks(content)
+    return _BLANKS_RE.sub('\n\n', cleaned), removed
+
+
+def test_single_line_fire_block_only_removes_itself():
+    content = (
+        "# 2026-03-01\n"
+        "🔥 [I] 10:00 Heartbeat ok *Source: heartbeat*\n"
+        "user line 1\n"
+        "user line 2\n"
+        "*Source: notes*\n"
+    )
+
+    cleaned, removed = _clean(content)
+
+    assert cleaned == _baseline_clean(content)
+    assert cleaned == "# 2026-03-01\nuser line 1\nuser line 2\n*Source: notes*\n"
+    assert removed == 1
+
+
+def test_multi_line_blocks_match_baseline():
+    content = (
+        "## [N] 14:22-23:46 - Heartbeat 系統運作摘要\n"
+        "### 狀態\n"
+        "all good\n"
+        "---\n"
+        "## [I] Project notes\n"
+        "keep me\n"
+        "1. 🔥 Heartbeat report\n"
+        "checked\n"
+        "*Source: heartbeat*\n"
+        "tail line\n"
+    )
+
+    cleaned, removed = _clean(content)
+
+    assert cleaned == _baseline_clean(content)
+    assert cleaned == "## [I] Project notes\nkeep me\ntail line\n"
+    assert removed == 2
+
+
+def test_section_header_ending_in_separator_does_not_swallow_next_section():
+    content = (
+        "## [N] 09:00 Heartbeat quick check ---\n"
+        "## [I] Project notes\n"
+        "keep me\n"
+        "---\n"
+    )
+
+    cleaned, removed = _clean(content)
+
+    assert cleaned == "## [I] Project notes\nkeep me\n---\n"
+    assert removed == 1
+
+
+def test_prose_ending_in_dashes_is_not_a_separator():
+    content = (
+        "## [N] Heartbeat 摘要\n"
+        "status ok - all good ---\n"
+        "more status\n"
+        "---\n"
+        "keep\n"
+    )
+
+    cleaned, removed = _clean(content)
+
+    assert cleaned == "keep\n"
+    assert removed == 1
+
+
+def test_unterminated_block_is_kept():
+    content = "1. 🔥 Heartbeat report\nno source line here\n"
+
+    assert _clean(content) == (content, 0)
+
+
+def test_long_dash_rule_ends_section_block():
+    content = (
+        "## [C] 12:00 - Heartbeat 自動提取\n"
+        "npm install foo\n"
+        + "-" * 50 + "\n"
+        "## [I] User notes\n"
+        "important user decision A\n"
+        "---\n"
+        "# tail\n"
+    )
+
+    cleaned, removed = _clean(content)
+
+    assert cleaned == _baseline_clean(content)
+    assert cleaned == "## [I] User notes\nimportant user decision A\n---\n# tail\n"
+    assert removed == 1
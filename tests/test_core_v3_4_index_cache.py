@@ -0,0 +1,76 @@
+import importlib.util
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_spec = importlib.util.spec_from_file_location(
+    "core_v3_4",
+    Path(__file__).resolve().parents[1] / "core_v3.4.py",
+)
+core_v3_4 = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(core_v3_4)
+
+SEGMENTS = [
+    {
+        "id": "seg-1",
+        "content": "[C] gateway port is 8080",
+        "source": "memory/2026-04-10.md",
+        "line_number": 3,
+        "category": "Technical",
+        "priority": "C",
+        "keywords": ["gateway", "port", "8080"],
+    },
+]
+
+
+def _write_cache(tmp_path, data):
+    cache = tmp_path / "cache"
+    cache.mkdir(exist_ok=True)
+    (cache / "index.json").write_text(json.dumps(data), encoding="utf-8")
+    return cache / "index.json"
+
+
+def _read_cache(index_file):
+    return json.loads(index_file.read_text(encoding="utf-8"))
+
+
+def test_legacy_index_json_is_loaded_and_upgraded(tmp_path):
+    index_file = _write_cache(tmp_path, {
+        "version": "3.3.4",
+        "segments": SEGMENTS,
+        "built_at": datetime.now().isoformat(),
+    })
+
+    system = core_v3_4.SoulMemorySystem(base_path=str(tmp_path))
+    system.initialize()
+
+    assert system.indexed
+    assert [s.id for s in system.vector_search.segments] == ["seg-1"]
+    assert system.vector_search.search("gateway")[0].line_number == 3
+
+    upgraded = _read_cache(index_file)
+    assert upgraded["format"] == system.INDEX_FORMAT
+    assert "postings" in upgraded
+
+    reloaded = core_v3_4.SoulMemorySystem(base_path=str(tmp_path))
+    reloaded.initialize()
+    assert reloaded.vector_search.search("gateway")[0].line_number == 3
+
+
+def test_mismatched_index_format_is_rebuilt(tmp_path):
+    index_file = _write_cache(tmp_path, {
+        "format": core_v3_4.SoulMemorySystem.INDEX_FORMAT + 1,
+        "segments": SEGMENTS,
+        "built_at": datetime.now().isoformat(),
+    })
+
+    system = core_v3_4.SoulMemorySystem(base_path=str(tmp_path))
+    system.initialize()
+
+    # 未知布局不加載，按重建路徑寫回當前格式
+    assert all(s.id != "seg-1" for s in system.vector_search.segments)
+    assert _read_cache(index_file)["format"] == system.INDEX_FORMAT
+
@@ -0,0 +1,53 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_spec = importlib.util.spec_from_file_location(
+    "heartbeat_trigger_v3_3",
+    Path(__file__).resolve().parents[1] / "heartbeat-trigger_v3_3.py",
+)
+heartbeat = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(heartbeat)
+
+
+def _full_count(daily_file):
+    counts = heartbeat._count_markers(daily_file.read_text(encoding="utf-8"))
+    return counts['auto_save'], counts['c'] + counts['i'] - counts['auto_save']
+
+
+def test_check_daily_memory_counts_appended_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(heartbeat, "DAY_STATS_FILE", tmp_path / "daily_stats.json")
+    daily = tmp_path / "2026-04-12.md"
+    daily.write_text("## [C] gateway port 8080\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == (0, 1)
+
+    with open(daily, "a", encoding="utf-8") as f:
+        f.write("## [I] [Auto-Save] staging moved\n## [C] keep dark mode\n")
+    assert heartbeat.check_daily_memory(daily) == _full_count(daily) == (1, 2)
+
+
+def test_check_daily_memory_rescans_rewritten_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(heartbeat, "DAY_STATS_FILE", tmp_path / "daily_stats.json")
+    daily = tmp_path / "2026-04-12.md"
+    daily.write_text("## [C] gateway port 8080\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == (0, 1)
+
+    # 改寫已計數的前綴後文件反而變長，不能當作追加處理
+    daily.write_text("## [I] note one\n## [I] note two\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == _full_count(daily) == (0, 2)
+
+    daily.write_text("plain text only\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == _full_count(daily) == (0, 0)
+
+
+def test_check_daily_memory_rescans_change_near_large_prefix_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(heartbeat, "DAY_STATS_FILE", tmp_path / "daily_stats.json")
+    daily = tmp_path / "2026-04-12.md"
+    body = "filler line\n" * 2000
+    daily.write_text(body + "## [C] gateway port 8080\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == (0, 1)
+
+    daily.write_text(body + "## [X] gateway port 8080\n## [I] more\n", encoding="utf-8")
+    assert heartbeat.check_daily_memory(daily) == _full_count(daily) == (0, 1)
@@ -0,0 +1,135 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.memory_decay import MemoryDecay, _JOURNAL_HEADER
+
+
+def _record(decay, segment_ids):
+    for segment_id in segment_ids:
+        decay.record_access(segment_id)
+
+
+def _reload(decay):
+    return MemoryDecay(cache_path=decay.cache_path).heat_map
+
+
+def test_journal_round_trip_without_compaction(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    _record(decay, ["a", "b", "a"])
+    decay.record_access("記憶-c")
+
+    assert not decay.heat_file.exists()
+    assert _reload(decay) == decay.heat_map
+    assert decay.heat_map["a"]["access_count"] == 2
+
+
+def test_compact_round_trip(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    _record(decay, ["a", "b", "a"])
+    decay.compact()
+
+    assert decay.journal_file.stat().st_size == 0
+    assert json.loads(decay.heat_file.read_text(encoding="utf-8"))["format"] == "columns"
+    assert _reload(decay) == decay.heat_map
+
+
+def test_replay_after_automatic_compaction(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    decay.JOURNAL_COMPACT_EVERY = 5
+
+    _record(decay, ["a", "b", "c", "a", "b"])
+    # 達到閾值後合併進快照並清空日誌
+    assert decay.journal_file.stat().st_size == 0
+    snapshot = _reload(decay)
+    assert snapshot == decay.heat_map
+
+    _record(decay, ["a", "d"])
+    assert decay.journal_file.stat().st_size > 0
+    assert _reload(decay) == decay.heat_map
+    assert decay.heat_map["a"]["access_count"] == 3
+
+
+def test_truncated_final_record_is_dropped(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    _record(decay, ["a", "b"])
+    expected = decay.heat_map
+    valid_size = decay.journal_file.stat().st_size
+
+    # 頭部聲明 10 字節 id，實際只寫了 3 字節
+    with open(decay.journal_file, "ab") as f:
+        f.write(_JOURNAL_HEADER.pack(1.0, 10) + b"abc")
+
+    reloaded = MemoryDecay(cache_path=tmp_path)
+    assert reloaded.heat_map == expected
+    assert decay.journal_file.stat().st_size == valid_size
+
+    # 截掉殘缺尾部後，新的追加仍能正確重放
+    reloaded.record_access("c")
+    assert _reload(reloaded) == reloaded.heat_map
+
+
+def test_legacy_json_snapshot_is_migrated(tmp_path):
+    legacy = {
+        "a": {"created": 100.0, "last_access": 200.0, "access_count": 3},
+        "b": {"created": 150.0, "last_access": 150.0, "access_count": 1},
+    }
+    (tmp_path / "heat_map.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    decay = MemoryDecay(cache_path=tmp_path)
+    assert decay.heat_map == legacy
+
+    decay.record_access("a")
+    decay.compact()
+    assert json.loads(decay.heat_file.read_text(encoding="utf-8"))["format"] == "columns"
+    migrated = _reload(decay)
+    assert migrated == decay.heat_map
+    assert migrated["a"]["access_count"] == 4
+    assert migrated["b"] == legacy["b"]
+
+
+def test_legacy_json_with_missing_fields_gets_defaults(tmp_path):
+    legacy = {"a": {"last_access": 200.0}, "b": {"created": 100.0, "last_access": 150.0, "access_count": 2}}
+    (tmp_path / "heat_map.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    heat_map = MemoryDecay(cache_path=tmp_path).heat_map
+    assert heat_map["a"] == {"created": 200.0, "last_access": 200.0, "access_count": 0}
+    assert heat_map["b"] == legacy["b"]
+
+
+def test_records_appended_after_torn_record_do_not_break_loading(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    _record(decay, ["a", "b"])
+    expected = decay.heat_map
+    valid_size = decay.journal_file.stat().st_size
+
+    # 殘缺記錄（4 字節 id 只寫了半個漢字）之後又被其他進程追加了完整記錄
+    with open(decay.journal_file, "ab") as f:
+        f.write(_JOURNAL_HEADER.pack(1.0, 4) + "記".encode("utf-8")[:2])
+        f.write(_JOURNAL_HEADER.pack(1.0, 1) + b"c")
+
+    reloaded = MemoryDecay(cache_path=tmp_path)
+    assert reloaded.heat_map == expected
+    assert decay.journal_file.stat().st_size == valid_size
+
+    reloaded.record_access("d")
+    assert _reload(reloaded) == reloaded.heat_map
+
+
+def test_heat_map_rejects_writes(tmp_path):
+    decay = MemoryDecay(cache_path=tmp_path)
+    decay.record_access("a")
+
+    with pytest.raises(TypeError):
+        decay.heat_map["b"] = {"created": 1.0, "last_access": 1.0, "access_count": 1}
+    with pytest.raises(TypeError):
+        decay.heat_map["a"]["access_count"] = 10
+    with pytest.raises(AttributeError):
+        decay.heat_map = {}
+
+    assert dict(decay.heat_map) == {"a": decay.heat_map["a"]}
+    assert decay.heat_map["a"]["access_count"] == 1
@@ -89,3 +89,60 @@ def test_vector_search_prefers_newer_memory_when_scores_tie():
 
     assert len(results) == 2
     assert results[0].source.endswith("2026-04-12.md")
+
+
+def test_vector_search_cache_is_dropped_when_segments_change():
+    vs = VectorSearch()
+    vs.add_segment({"content": "Gateway port 8080", "source": "memory/a.md"})
+
+    assert [r.content for r in vs.search("gateway")] == ["Gateway port 8080"]
+    assert [r.content for r in vs.search("gateway")] == ["Gateway port 8080"]
+    assert vs.cache_stats == {"cache_hits": 1, "cache_misses": 1}
+
+    vs.search("gateway")[0].score = -1.0
+    assert vs.search("gateway")[0].score > 0
+
+    vs.add_segment({"content": "[C] gateway moved to 9090", "source": "memory/b.md", "priority": "C"})
+
+    assert [r.content for r in vs.search("gateway")] == ["[C] gateway moved to 9090", "Gateway port 8080"]
+
+
+def test_add_memory_before_initialize_is_indexed_once(tmp_path):
+    system = SoulMemorySystem(workspace_path=str(tmp_path))
+
+    system.add_memory("[C] Remember the gateway port is 8080 for the api")
+    system.initialize()
+    system.initialize()
+
+    matches = [s for s in system.vector_search.segments if "gateway port" in s.content]
+    assert len(matches) == 1
+
+
+def test_add_memories_writes_batch_once_and_dedups_within_batch(tmp_path):
+    system = SoulMemorySystem(workspace_path=str(tmp_path))
+    system.initialize()
+
+    ids = system.add_memories([
+        "[C] Remember the gateway port is 8080 for the api",
+        "[C] Remember the gateway port is 8080 for the api",
+        "[I] The staging database moved to db2.internal",
+    ])
+
+    assert len(ids) == 3
+    assert ids[0] == ids[1]
+    daily = next(system.daily_dir.glob("*.md")).read_text(encoding="utf-8")
+    assert daily.count("gateway port is 8080") == 1
+    assert "staging database moved" in daily
+    assert len(system.vector_search.segments) == 2
+
+
+def test_search_cache_is_invalidated_by_new_memories(tmp_path):
+    system = SoulMemorySystem(workspace_path=str(tmp_path))
+    system.initialize()
+
+    assert system.search("gateway port") == []
+    system.add_memory("[C] Remember the gateway port is 8080 for the api")
+
+    results = system.search("gateway port")
+    assert results and "8080" in results[0].content
+    assert system.search("gateway port") == results
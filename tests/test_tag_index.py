@@ -0,0 +1,109 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.tag_index import TagIndex
+
+UPDATES = [
+    ([("技術", 3), ("配置", 2)], "memory/2026-04-10.md", 1, "C"),
+    ([("技術", 2), ("用戶", 1)], "memory/2026-04-10.md", 5, "I"),
+    ([("配置", 3)], "memory/2026-04-11.md", 2, "N"),
+    ([("用戶", 2), ("技術", 1), ("技術", 1)], "memory/2026-04-11.md", 7, "I"),
+    ([("項目", 1)], "memory/2026-04-12.md", 3, "N"),
+]
+
+QUERIES = [["技術"], ["技術", "配置"], ["用戶", "技術"], ["配置", "項目"], ["缺失"]]
+
+
+def _apply_updates(index, updates, sync=True):
+    for tags, file, line, priority in updates:
+        index.add(tags, file, line, priority)
+        if sync:
+            index.sync()
+
+
+def _assert_same_results(expected, actual):
+    assert actual.index == expected.index
+    assert actual.reverse_index == expected.reverse_index
+    for query in QUERIES:
+        for operator in ("AND", "OR"):
+            assert actual.search(query, operator) == expected.search(query, operator)
+
+
+def test_reloaded_index_matches_fresh_index(tmp_path):
+    fresh = TagIndex()
+    _apply_updates(fresh, UPDATES, sync=False)
+
+    stored = TagIndex(str(tmp_path / "tag_index.json"))
+    _apply_updates(stored, UPDATES)
+
+    assert not stored.index_file.exists()
+    _assert_same_results(fresh, TagIndex(str(tmp_path / "tag_index.json")))
+
+
+def test_log_is_compacted_into_snapshot(tmp_path):
+    fresh = TagIndex()
+    _apply_updates(fresh, UPDATES, sync=False)
+
+    stored = TagIndex(str(tmp_path / "tag_index.json"))
+    stored.LOG_COMPACT_EVERY = 3
+    _apply_updates(stored, UPDATES[:3])
+
+    # 第三次 sync 達到閾值：日誌合併進快照並清空
+    assert stored.index_file.exists()
+    assert stored.log_file.stat().st_size == 0
+
+    _apply_updates(stored, UPDATES[3:])
+    assert stored.log_file.stat().st_size > 0
+    _assert_same_results(fresh, TagIndex(str(tmp_path / "tag_index.json")))
+
+    stored.compact()
+    assert stored.log_file.stat().st_size == 0
+    _assert_same_results(fresh, TagIndex(str(tmp_path / "tag_index.json")))
+
+
+def test_partly_written_last_log_line_is_ignored(tmp_path):
+    index_file = str(tmp_path / "tag_index.json")
+    stored = TagIndex(index_file)
+    _apply_updates(stored, UPDATES[:2])
+
+    with open(stored.log_file, "a", encoding="utf-8") as f:
+        f.write('{"tags":[["技術",3]],"file":"2026-04-1')
+
+    expected = TagIndex()
+    _apply_updates(expected, UPDATES[:2], sync=False)
+    reloaded = TagIndex(index_file)
+    _assert_same_results(expected, reloaded)
+
+    # 殘行之後追加的記錄不能被殘行吞掉
+    _apply_updates(reloaded, UPDATES[2:])
+    _apply_updates(expected, UPDATES[2:], sync=False)
+    _assert_same_results(expected, TagIndex(index_file))
+
+
+def _add_from_process(index_file, worker, count):
+    index = TagIndex(index_file)
+    index.LOG_COMPACT_EVERY = 7
+    for line in range(count):
+        index.add([("並發", 1)], f"memory/worker-{worker}.md", line, "N")
+        index.sync()
+
+
+def test_concurrent_appends_survive_compaction(tmp_path):
+    import multiprocessing
+
+    pytest.importorskip("fcntl")
+    index_file = str(tmp_path / "tag_index.json")
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_from_process, args=(index_file, worker, 150)) for worker in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    # 其他進程在合併期間追加的記錄不能隨日誌一起被清掉
+    assert len(TagIndex(index_file).index["並發"]) == 3 * 150
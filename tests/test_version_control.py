@@ -0,0 +1,56 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.version_control import VersionControl
+
+pytestmark = pytest.mark.skipif(
+    subprocess.run(["git", "--version"], capture_output=True).returncode != 0,
+    reason="git is not installed",
+)
+
+
+@pytest.fixture(autouse=True)
+def _git_identity(monkeypatch):
+    for key in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(key, "soul-memory")
+    for key in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(key, "soul-memory@localhost")
+
+
+def _committed_files(repo):
+    result = subprocess.run(
+        ["git", "ls-files"], cwd=repo, capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()
+
+
+def test_commit_stages_existing_files_when_one_path_is_missing(tmp_path):
+    (tmp_path / "a.md").write_text("a\n", encoding="utf-8")
+    (tmp_path / "b.md").write_text("b\n", encoding="utf-8")
+    vc = VersionControl(str(tmp_path))
+
+    ok, _ = vc.commit("add notes", ["a.md", "missing.md", "b.md"])
+
+    assert ok
+    assert _committed_files(tmp_path) == ["a.md", "b.md"]
+
+
+def test_instances_for_one_repo_share_a_single_worker(tmp_path):
+    (tmp_path / "a.md").write_text("a\n", encoding="utf-8")
+    (tmp_path / "b.md").write_text("b\n", encoding="utf-8")
+    before = threading.active_count()
+
+    first = VersionControl(str(tmp_path))
+    second = VersionControl(str(tmp_path))
+    first.commit_async("add a", ["a.md"])
+    second.commit_async("add b", ["b.md"])
+
+    assert threading.active_count() == before + 1
+    second.flush()
+    assert _committed_files(tmp_path) == ["a.md", "b.md"]